@@ -1,28 +1,35 @@
 from flask import Flask
 from flask_restx import Api
 from .orders.views import order_namespace
+from .orders import archive, inventory, shards, stats
 from .auth.views import auth_namespace
-from .config.config import config_dict
-from .utils import db
-from .models.orders import Order , Resource as ResourceModel
+from .auth import identity, passwords
+from .config.config import config_from_env
+from .utils import compression, db, idempotency, metrics, prefork, replicas, sqlite
+from .models.orders import Order , ArchivedOrder, Resource as ResourceModel, ResourceShard
 from .models.users import User
-from flask_migrate import Migrate
+from .models.jobs import Job
 from flask_jwt_extended import JWTManager
 from werkzeug.exceptions import NotFound, MethodNotAllowed
-from flask_cors import CORS
 
 
  
-def create_app(config=config_dict['dev']):
+def create_app(config=None, commands=True):
+    """
+        config defaults to the class named by APP_CONFIG. commands=False
+        leaves out Flask-Migrate and the CLI commands, which a server
+        process never uses and which take a good part of the startup.
+    """
+    if config is None:
+        config = config_from_env()
     app = Flask(__name__)
 
 
-    # Configure the app
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///your_database.db'
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Configure the app, the database comes from the config object
     #app.config['JWT_SECRET_KEY'] = 'your-secret-key'  # Change this!
 
     # Apply CORS to the entire app
+    #from flask_cors import CORS
     #CORS(app)
     #CORS(app, resources={
     '''r"/*": {
@@ -32,6 +39,8 @@ def create_app(config=config_dict['dev']):
         }
     })'''
     app.config.from_object(config)
+    if not app.config.get('SQLALCHEMY_DATABASE_URI'):
+        raise RuntimeError(f"{config.__name__} has no database, set DATABASE_URL")
     authorizations={
         "Bearer Auth":{
             'type':"apiKey",
@@ -48,10 +57,30 @@ def create_app(config=config_dict['dev']):
     api.add_namespace(order_namespace)
     api.add_namespace(auth_namespace, path='/auth')
     db.init_app(app)
+    sqlite.init_app(app, db)
+    replicas.init_app(app, db)
 
     jwt = JWTManager(app)
+    identity.init_app(app)
+    passwords.init_app(app)
+    inventory.init_app(app)
+    idempotency.init_app(app)
+    metrics.init_app(app, db)
+    compression.init_app(app)
 
-    migrate = Migrate(app, db)
+    prefork.init_app(app, db)
+
+    if commands:
+        # alembic is heavy to import and only the db commands need it
+        from flask_migrate import Migrate
+        from .jobs import worker
+        migrate = Migrate(app, db)
+        stats.register_commands(app)
+        shards.register_commands(app)
+        archive.register_commands(app)
+        worker.register_commands(app)
+        idempotency.register_commands(app)
+        replicas.register_commands(app)
 
 
     ##costum error handler
@@ -72,7 +101,10 @@ def create_app(config=config_dict['dev']):
             'db': db,
             'User': User,
             'Order' : Order,
-            'Resource' : ResourceModel
+            'ArchivedOrder' : ArchivedOrder,
+            'Resource' : ResourceModel,
+            'ResourceShard' : ResourceShard,
+            'Job' : Job
         }
 
     return app
@@ -0,0 +1,105 @@
+#who is calling: resolved from the JWT uid claim and a small identity cache
+from collections import namedtuple
+from flask import current_app, has_app_context
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+from werkzeug.exceptions import Unauthorized
+from ..models.users import User
+from ..utils import db
+from ..utils.cache import TTLCache
+
+
+Identity = namedtuple('Identity', ['id', 'userName', 'role', 'is_active'])
+
+
+def identity_claims(user):
+    """
+        The extra claims carried by every access and refresh token. Only
+        the id: the role and active flag are read from the database, a
+        copy in the token would outlive a change to them
+    """
+    return {'uid': user.id}
+
+
+class IdentityStore:
+    """
+        Identities by user id, read from the database and kept for
+        IDENTITY_CACHE_TTL seconds. The role and active claims of a token
+        are never trusted: a role changed anywhere, in another worker, in
+        flask shell or in SQL, is picked up once the entry expires. Changes
+        committed through this process drop the entry at once.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def invalidate(self, user_id):
+        self.cache.pop(user_id)
+
+
+def init_app(app):
+    app.extensions['identity'] = IdentityStore(
+        maxsize=app.config['IDENTITY_CACHE_SIZE'],
+        ttl=app.config['IDENTITY_CACHE_TTL']
+    )
+
+
+def _from_user(user):
+    return Identity(user.id, user.userName, user.role, bool(user.is_active))
+
+
+def current_user():
+    """
+        The identity of the caller of a jwt_required view
+    """
+    store = current_app.extensions['identity']
+    claims = get_jwt()
+    user_id = claims.get('uid')
+
+    if user_id is None:
+        # tokens issued before the claims existed only carry the user name
+        user = User.query.filter_by(userName=get_jwt_identity()).first()
+        if user is None:
+            raise Unauthorized("Unknown user")
+        return _from_user(user)
+
+    identity = store.cache.get(user_id)
+    if identity is not None:
+        return identity
+
+    # the role as it is now, not as it was when the token was issued
+    row = db.session.execute(
+        select(User.id, User.userName, User.role, User.is_active).where(User.id == user_id)
+    ).first()
+    if row is None:
+        raise Unauthorized("Unknown user")
+    identity = Identity(row.id, row.userName, row.role, bool(row.is_active))
+
+    store.cache.set(user_id, identity)
+    return identity
+
+
+@event.listens_for(User, 'after_update')
+def _remember_identity_change(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.role.history.has_changes() or state.attrs.is_active.history.has_changes():
+        inspect(target).session.info.setdefault('identity_changes', set()).add(target.id)
+
+
+@event.listens_for(User, 'after_delete')
+def _remember_identity_delete(mapper, connection, target):
+    inspect(target).session.info.setdefault('identity_changes', set()).add(target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_identities(session):
+    changed = session.info.pop('identity_changes', None)
+    if changed and has_app_context() and 'identity' in current_app.extensions:
+        for user_id in changed:
+            current_app.extensions['identity'].invalidate(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_identity_changes(session):
+    session.info.pop('identity_changes', None)
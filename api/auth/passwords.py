@@ -0,0 +1,111 @@
+#password hashing off the request thread, with a cap on how many run at once
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore
+from flask import current_app
+from sqlalchemy import update
+from werkzeug.exceptions import ServiceUnavailable
+from werkzeug.security import generate_password_hash, check_password_hash
+from ..models.users import User
+from ..utils import aio, db
+
+
+def method_string(method, cost):
+    """
+        The werkzeug method for a method name and its cost: N for scrypt,
+        the iterations for pbkdf2 or pbkdf2:<digest> (sha256 by default).
+        A RuntimeError names a pair werkzeug would fail on at the first hash
+    """
+    if not isinstance(cost, int) or cost < 1:
+        raise RuntimeError(f"PASSWORD_HASH_COST must be a positive integer, got {cost!r}")
+    if method == 'scrypt':
+        if cost < 2 or cost & (cost - 1):
+            raise RuntimeError(f"PASSWORD_HASH_COST is N for scrypt, a power of 2, got {cost}")
+        return f"scrypt:{cost}:8:1"
+    if method == 'pbkdf2':
+        method = 'pbkdf2:sha256'
+    name, _, digest = method.partition(':')
+    if name != 'pbkdf2' or digest not in hashlib.algorithms_available:
+        raise RuntimeError(f"PASSWORD_HASH_METHOD must be scrypt, pbkdf2 or pbkdf2:<digest>, got {method!r}")
+    return f"{method}:{cost}"
+
+
+class PasswordHasher:
+    """
+        Hashes run in a pool of worker threads, hashlib releases the GIL
+        while it works. At most max_pending hashes wait or run at once,
+        beyond that callers get a 503 instead of piling up.
+    """
+
+    def __init__(self, method, workers, max_pending, timeout):
+        self.method = method
+        self.timeout = timeout
+        self._workers = workers
+        self._max_pending = max_pending
+        self._start()
+
+    def _start(self):
+        self._pid = os.getpid()
+        self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix='password-hash')
+        self._slots = BoundedSemaphore(self._max_pending)
+
+    def _submit(self, fn, *args, wait=True):
+        if self._pid != os.getpid():
+            # a forked worker: the parent's threads did not come along
+            self._start()
+        if not self._slots.acquire(blocking=wait, timeout=self.timeout if wait else None):
+            raise ServiceUnavailable("Too many logins at once, try again")
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def hash(self, password):
+        return aio.wait(self._submit(generate_password_hash, password, self.method))
+
+    def verify(self, pwhash, password):
+        return aio.wait(self._submit(check_password_hash, pwhash, password))
+
+    def needs_rehash(self, pwhash):
+        return pwhash.split('$', 1)[0] != self.method
+
+    def rehash_later(self, app, user_id, old_hash, password):
+        """
+            Store a hash at the current cost, unless the password changed meanwhile
+        """
+        def work():
+            new_hash = generate_password_hash(password, self.method)
+
+            def store():
+                with app.app_context():
+                    db.session.execute(
+                        update(User)
+                        .where(User.id == user_id, User.password == old_hash)
+                        .values(password=new_hash)
+                    )
+                    db.session.commit()
+
+            aio.run_io(app, store)
+
+        try:
+            self._submit(work, wait=False)
+        except ServiceUnavailable:
+            # busy, the next login tries again
+            pass
+
+
+def init_app(app):
+    app.extensions['password_hasher'] = PasswordHasher(
+        method=method_string(app.config['PASSWORD_HASH_METHOD'], app.config['PASSWORD_HASH_COST']),
+        workers=app.config['PASSWORD_HASH_WORKERS'],
+        max_pending=app.config['PASSWORD_HASH_MAX_PENDING'],
+        timeout=app.config['PASSWORD_HASH_TIMEOUT']
+    )
+
+
+def get_hasher():
+    return current_app.extensions['password_hasher']
@@ -1,9 +1,11 @@
 from flask_restx import Namespace, Resource, fields
-from flask import request
+from flask import request, current_app
 from ..models.users import User
-from werkzeug.security import generate_password_hash , check_password_hash
 from http import HTTPStatus
-from flask_jwt_extended import (create_access_token , create_refresh_token, jwt_required, get_jwt_identity)
+from flask_jwt_extended import (create_access_token , create_refresh_token, jwt_required, get_jwt_identity, get_jwt)
+from .identity import identity_claims
+from .passwords import get_hasher
+from ..utils import db
 from werkzeug.exceptions import Conflict , BadRequest
 
 auth_namespace = Namespace('auth', description="a name space for authentication")
@@ -51,12 +53,18 @@ class SignUp(Resource):
         """
         data = request.get_json()
 
+        if not isinstance(data.get('password'), str) or not data['password']:
+            raise BadRequest("password must be a non empty string")
+
+        # hashed outside the try, a busy hasher is not a conflict
+        password = get_hasher().hash(data['password'])
+
         #handle the error that : if the user is already exist
         try:
             new_user = User(
                 userName = data.get('userName'),
                 Email=data.get('Email'),
-                password=generate_password_hash(data.get('password')),
+                password=password,
                 role=data.get('role', 'CLIENT')
             )
         
@@ -65,7 +73,7 @@ class SignUp(Resource):
             return new_user, HTTPStatus.CREATED
         
         except Exception as e :
-            raise Conflict(f"User with the email : {data.get('Email')}  already exists")
+            raise Conflict(f"User with the email : {data.get('Email')} or the user name : {data.get('userName')} already exists")
             
 
 
@@ -87,9 +95,14 @@ class Login(Resource):
         user = User.query.filter_by(Email=Email).first()
         
 
-        if user is not None and check_password_hash(user.password,password):
-            access_token = create_access_token(identity=user.userName)
-            refresh_token = create_refresh_token(identity=user.userName)
+        hasher = get_hasher()
+        if user is not None and isinstance(password, str) and hasher.verify(user.password,password):
+            if hasher.needs_rehash(user.password):
+                hasher.rehash_later(current_app._get_current_object(), user.id, user.password, password)
+
+            claims = identity_claims(user)
+            access_token = create_access_token(identity=user.userName, additional_claims=claims)
+            refresh_token = create_refresh_token(identity=user.userName, additional_claims=claims)
 
             response = {
                 'access_token': access_token,
@@ -112,6 +125,15 @@ class Refresh(Resource):
     def post(self):
         userName = get_jwt_identity()
 
-        access_token = create_access_token(identity=userName)
+        # read the user again so a role change since login reaches the new token
+        user_id = get_jwt().get('uid')
+        if user_id is not None:
+            user = db.session.get(User, user_id)
+        else:
+            user = User.query.filter_by(userName=userName).first()
+        if user is None:
+            raise BadRequest("Unknown user")
+
+        access_token = create_access_token(identity=user.userName, additional_claims=identity_claims(user))
 
         return {"access_token" : access_token}, HTTPStatus.OK
@@ -4,12 +4,89 @@ from datetime import timedelta
 
 BASE_DIR = os.path.dirname(os.path.realpath(__file__))
 
+
+def engine_options(uri):
+    """
+        Pool settings for server databases, SQLite is tuned per connection instead
+    """
+    if not uri or uri.startswith('sqlite'):
+        return {}
+    return {
+        'pool_size': config('DB_POOL_SIZE', 10, cast=int),
+        'max_overflow': config('DB_MAX_OVERFLOW', 20, cast=int),
+        'pool_recycle': config('DB_POOL_RECYCLE', 1800, cast=int),
+        'pool_timeout': config('DB_POOL_TIMEOUT', 30, cast=int),
+        'pool_pre_ping': config('DB_POOL_PRE_PING', True, cast=bool),
+    }
+
+
+def replica_binds(urls):
+    """
+        SQLALCHEMY_BINDS entries, replica0, replica1..., for a comma separated list of replica URLs
+    """
+    return {f'replica{i}': url.strip() for i, url in enumerate(urls.split(',')) if url.strip()}
+
+
 class Config:
     SECRET_KEY=config('SECRET_KEY', 'secret')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=30)
     JWT_REFRESH_TOKEN_EXPRESS = timedelta(minutes=30)
     JWT_SECRET_KEY = config('JWT_SECRET_KEY')
+    METRICS_ENABLED = config('METRICS_ENABLED', True, cast=bool)
+    #when set, /metrics answers only requests with Authorization: Bearer <token>
+    METRICS_TOKEN = config('METRICS_TOKEN', '')
+    PASSWORD_HASH_METHOD = config('PASSWORD_HASH_METHOD', 'scrypt')
+    PASSWORD_HASH_COST = config('PASSWORD_HASH_COST', 32768, cast=int)
+    PASSWORD_HASH_WORKERS = config('PASSWORD_HASH_WORKERS', 2, cast=int)
+    PASSWORD_HASH_MAX_PENDING = config('PASSWORD_HASH_MAX_PENDING', 16, cast=int)
+    PASSWORD_HASH_TIMEOUT = config('PASSWORD_HASH_TIMEOUT', 5.0, cast=float)
+    PAGE_SIZE_DEFAULT = config('PAGE_SIZE_DEFAULT', 50, cast=int)
+    PAGE_SIZE_MAX = config('PAGE_SIZE_MAX', 100, cast=int)
+    EXPORT_BATCH_SIZE = config('EXPORT_BATCH_SIZE', 1000, cast=int)
+    BATCH_MAX_SIZE = config('BATCH_MAX_SIZE', 100, cast=int)
+    STATUS_BATCH_MAX_SIZE = config('STATUS_BATCH_MAX_SIZE', 500, cast=int)
+    INVENTORY_CACHE_ENABLED = config('INVENTORY_CACHE_ENABLED', True, cast=bool)
+    INVENTORY_CACHE_CHECK_INTERVAL = config('INVENTORY_CACHE_CHECK_INTERVAL', 1.0, cast=float)
+    IDENTITY_CACHE_SIZE = config('IDENTITY_CACHE_SIZE', 1024, cast=int)
+    #seconds a role or active change made elsewhere may take to apply
+    IDENTITY_CACHE_TTL = config('IDENTITY_CACHE_TTL', 10, cast=int)
+    COMPRESS_ENABLED = config('COMPRESS_ENABLED', True, cast=bool)
+    #bytes, smaller bodies are not worth the CPU
+    COMPRESS_MIN_SIZE = config('COMPRESS_MIN_SIZE', 1024, cast=int)
+    COMPRESS_LEVEL = config('COMPRESS_LEVEL', 6, cast=int)
+    COMPRESS_BROTLI = config('COMPRESS_BROTLI', True, cast=bool)
+    COMPRESS_BROTLI_QUALITY = config('COMPRESS_BROTLI_QUALITY', 4, cast=int)
+    COMPRESS_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/csv', 'text/plain', 'text/html')
+    IDEMPOTENCY_TTL = config('IDEMPOTENCY_TTL', 24 * 3600, cast=int)
+    IDEMPOTENCY_CACHE_SIZE = config('IDEMPOTENCY_CACHE_SIZE', 4096, cast=int)
+    IDEMPOTENCY_PURGE_BATCH = config('IDEMPOTENCY_PURGE_BATCH', 1000, cast=int)
+    JOBS_ENABLED = config('JOBS_ENABLED', True, cast=bool)
+    JOBS_WORKERS = config('JOBS_WORKERS', 4, cast=int)
+    JOBS_BATCH_SIZE = config('JOBS_BATCH_SIZE', 20, cast=int)
+    JOBS_POLL_INTERVAL = config('JOBS_POLL_INTERVAL', 1.0, cast=float)
+    JOBS_VISIBILITY_TIMEOUT = config('JOBS_VISIBILITY_TIMEOUT', 60, cast=int)
+    JOBS_MAX_ATTEMPTS = config('JOBS_MAX_ATTEMPTS', 5, cast=int)
+    JOBS_BACKOFF_BASE = config('JOBS_BACKOFF_BASE', 2.0, cast=float)
+    JOBS_BACKOFF_MAX = config('JOBS_BACKOFF_MAX', 300.0, cast=float)
+    FULFILMENT_AUTO_START = config('FULFILMENT_AUTO_START', False, cast=bool)
+    #closed orders older than this move to orders_archive, see flask archive-orders
+    ARCHIVE_AFTER_DAYS = config('ARCHIVE_AFTER_DAYS', 90, cast=int)
+    ARCHIVE_BATCH_SIZE = config('ARCHIVE_BATCH_SIZE', 500, cast=int)
+    #stock rows per resource, above 1 orders of one color update different rows. flask rebalance-stock after a change
+    STOCK_SHARDS = config('STOCK_SHARDS', 1, cast=int)
+    #read only copies of the database, GET requests of REPLICA_NAMESPACES read from them
+    SQLALCHEMY_BINDS = replica_binds(config('REPLICA_DATABASE_URLS', ''))
+    REPLICA_NAMESPACES = ('orders', 'auth')
+    #seconds a client that wrote keeps reading from the primary
+    REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', 5, cast=int)
+    SQLITE_TUNING = config('SQLITE_TUNING', True, cast=bool)
+    SQLITE_JOURNAL_MODE = config('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = config('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT = config('SQLITE_BUSY_TIMEOUT', 5000, cast=int)
+    #negative is in KiB
+    SQLITE_CACHE_SIZE = config('SQLITE_CACHE_SIZE', -20000, cast=int)
+    SQLITE_MMAP_SIZE = config('SQLITE_MMAP_SIZE', 256 * 1024 * 1024, cast=int)
 
 
 class DevConfig(Config):
@@ -26,13 +103,29 @@ class TestConfig(Config):
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
 class ProdConfig(Config):
-    #SQLALCHEMY_DATABASE_URI = config('DATABASE_URL')
+    #no fallback, create_app refuses to start without it
+    SQLALCHEMY_DATABASE_URI = config('DATABASE_URL', None)
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    DEBUG = config('DEBUG', cast=bool)
+    SQLALCHEMY_ECHO = False
+    #/metrics is public unless METRICS_TOKEN is set, so it is opt-in here
+    METRICS_ENABLED = config('METRICS_ENABLED', False, cast=bool)
+    #never from DEBUG, the .env of a development checkout sets it
+    DEBUG = False
 
 
 config_dict={
     'dev' : DevConfig,
     'prod' : ProdConfig,
     'testing' : TestConfig
-}
\ No newline at end of file
+}
+
+
+def config_from_env(default='dev'):
+    """
+        The config class named by APP_CONFIG: dev, prod or testing, default when it is unset
+    """
+    name = config('APP_CONFIG', default)
+    if name not in config_dict:
+        raise RuntimeError(f"APP_CONFIG must be one of {', '.join(config_dict)}, got {name!r}")
+    return config_dict[name]
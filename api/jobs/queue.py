@@ -0,0 +1,109 @@
+#the durable job queue: jobs are rows of the jobs table, enqueued in the caller's transaction
+import json
+import random
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, insert, or_, select, update
+from ..models.jobs import Job
+from ..utils import db
+
+
+QUEUED = 'QUEUED'
+FAILED = 'FAILED'
+
+# kind -> function(payload), filled by the handler decorator
+HANDLERS = {}
+
+
+def handler(kind):
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def enqueue(kind, payload=None, delay=0):
+    """
+        Add a job to the current transaction, workers see it once the caller commits
+    """
+    enqueue_many(kind, [payload or {}], delay)
+
+
+def enqueue_many(kind, payloads, delay=0):
+    if not payloads or not current_app.config['JOBS_ENABLED']:
+        return
+    now = datetime.utcnow()
+    db.session.execute(insert(Job), [{
+        'kind': kind,
+        'payload': json.dumps(payload),
+        'status': QUEUED,
+        'attempts': 0,
+        'max_attempts': current_app.config['JOBS_MAX_ATTEMPTS'],
+        'available_at': now + timedelta(seconds=delay),
+        'date_created': now
+    } for payload in payloads])
+
+
+def claim(worker, limit, visibility_timeout):
+    """
+        Lock up to limit ready jobs for worker and return them.
+        The select and the lock are one UPDATE ... RETURNING, so two workers
+        never get the same job while its lock holds.
+    """
+    now = datetime.utcnow()
+    ready = (
+        Job.status == QUEUED,
+        Job.available_at <= now,
+        or_(Job.locked_until.is_(None), Job.locked_until < now),
+    )
+    candidates = select(Job.id).where(*ready).order_by(Job.available_at, Job.id).limit(limit)
+    rows = db.session.execute(
+        update(Job)
+        .where(Job.id.in_(candidates), *ready)
+        .values(locked_until=now + timedelta(seconds=visibility_timeout), locked_by=worker,
+                attempts=Job.attempts + 1)
+        .returning(Job.id, Job.kind, Job.payload, Job.attempts, Job.max_attempts)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.session.commit()
+    return rows
+
+
+def complete(worker, ids):
+    """
+        Ack done jobs. A job whose lock ran out and was claimed again is left
+        to its new worker.
+    """
+    if not ids:
+        return
+    db.session.execute(
+        delete(Job)
+        .where(Job.id.in_(ids), Job.locked_by == worker)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+def backoff(attempts):
+    config = current_app.config
+    delay = min(config['JOBS_BACKOFF_BASE'] * 2 ** (attempts - 1), config['JOBS_BACKOFF_MAX'])
+    # jitter, so jobs that failed together don't come back together
+    return delay * random.uniform(0.5, 1.0)
+
+
+def fail(worker, job, error):
+    """
+        Put the job back with a delay, or give up on it after max_attempts
+    """
+    values = {'locked_until': None, 'locked_by': None, 'last_error': error}
+    if job.attempts < job.max_attempts:
+        values['available_at'] = datetime.utcnow() + timedelta(seconds=backoff(job.attempts))
+    else:
+        values['status'] = FAILED
+    db.session.execute(
+        update(Job)
+        .where(Job.id == job.id, Job.locked_by == worker)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
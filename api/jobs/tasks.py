@@ -0,0 +1,33 @@
+#the follow-up work of orders, enqueued by the reservations service and run by the worker
+from flask import current_app
+from sqlalchemy import select
+from ..models.orders import Order, OrderStatus
+from ..orders import reservations
+from ..utils import db
+from .queue import handler
+
+
+def notify(event, order_ids, **details):
+    """
+        Where customer and ops notifications go out, a log line for now
+    """
+    current_app.logger.info("notify %s orders=%s %s", event, order_ids, details)
+
+
+@handler('order_created')
+def order_created(payload):
+    order_ids = payload['order_ids']
+    notify('order_created', order_ids)
+
+    if current_app.config['FULFILMENT_AUTO_START']:
+        # a rerun or an order canceled meanwhile finds nothing left to start
+        pending = db.session.execute(
+            select(Order.id).where(Order.id.in_(order_ids), Order.order_status == OrderStatus.PENDING)
+        ).scalars().all()
+        if pending:
+            reservations.change_statuses(pending, OrderStatus.IN_PROGRESS)
+
+
+@handler('order_status_changed')
+def order_status_changed(payload):
+    notify('order_status_changed', payload['order_ids'], order_status=payload['order_status'])
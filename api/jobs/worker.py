@@ -0,0 +1,137 @@
+#the worker pool that runs the queued jobs, started with `flask run-worker`
+import json
+import os
+import socket
+import threading
+import traceback
+import click
+from ..utils import db
+from . import queue
+#registers the order handlers
+from . import tasks  # noqa: F401
+
+
+#seconds, the longest a thread waits after a failed batch
+MAX_ERROR_BACKOFF = 30.0
+
+
+class Worker:
+    """
+        Threads that claim jobs in batches, run their handlers and ack the
+        batch. Delivery is at least once: a job whose worker dies before the
+        ack is claimed again when its visibility timeout passes, so handlers
+        must be safe to run twice.
+    """
+
+    def __init__(self, app, workers, batch_size, poll_interval, visibility_timeout):
+        self.app = app
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.visibility_timeout = visibility_timeout
+        self.processed = 0
+        self.failed = 0
+        #batches that failed outside a handler, the claim or the ack
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def run(self, burst=False):
+        """
+            Run until stop() or Ctrl-C, with burst until nothing is ready
+        """
+        threads = [
+            threading.Thread(target=self._loop, args=(n, burst), name=f'jobs-worker-{n}', daemon=True)
+            for n in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            # the current batches finish, their jobs are acked
+            self.stop()
+            for thread in threads:
+                thread.join()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self, n, burst):
+        name = f"{socket.gethostname()}:{os.getpid()}:{n}"
+        errors = 0
+        with self.app.app_context():
+            while not self._stop.is_set():
+                try:
+                    claimed = self._step(name)
+                except Exception:
+                    # e.g. database is locked: the thread lives on, unacked jobs come back after their timeout
+                    db.session.rollback()
+                    errors += 1
+                    with self._lock:
+                        self.errors += 1
+                    delay = min(self.poll_interval * 2 ** errors, MAX_ERROR_BACKOFF)
+                    self.app.logger.exception("jobs worker %s failed, retrying in %.1fs", name, delay)
+                    self._stop.wait(delay)
+                    continue
+                errors = 0
+                if not claimed:
+                    if burst:
+                        break
+                    self._stop.wait(self.poll_interval)
+            db.session.remove()
+
+    def _step(self, name):
+        """
+            Claim, run and ack one batch, return how many jobs it had
+        """
+        jobs = queue.claim(name, self.batch_size, self.visibility_timeout)
+        if not jobs:
+            return 0
+        done = [job.id for job in jobs if self._run(name, job)]
+        queue.complete(name, done)
+        with self._lock:
+            self.processed += len(done)
+            self.failed += len(jobs) - len(done)
+        return len(jobs)
+
+    def _run(self, name, job):
+        try:
+            if job.attempts > job.max_attempts:
+                # claimed again after its worker died on the last attempt
+                raise RuntimeError("Out of attempts")
+            handler = queue.HANDLERS.get(job.kind)
+            if handler is None:
+                raise LookupError(f"No handler for {job.kind}")
+            handler(json.loads(job.payload))
+            return True
+        except Exception:
+            db.session.rollback()
+            self.app.logger.exception("job %s (%s) failed, attempt %s", job.id, job.kind, job.attempts)
+            queue.fail(name, job, traceback.format_exc(limit=5))
+            return False
+
+
+def register_commands(app):
+
+    @app.cli.command('run-worker')
+    @click.option('--workers', type=int, help="threads, JOBS_WORKERS by default")
+    @click.option('--batch-size', type=int, help="jobs claimed at once, JOBS_BATCH_SIZE by default")
+    @click.option('--burst', is_flag=True, help="exit once no job is ready")
+    def run_worker(workers, batch_size, burst):
+        """
+            Run the background jobs
+        """
+        config = app.config
+        worker = Worker(
+            app,
+            workers=workers or config['JOBS_WORKERS'],
+            batch_size=batch_size or config['JOBS_BATCH_SIZE'],
+            poll_interval=config['JOBS_POLL_INTERVAL'],
+            visibility_timeout=config['JOBS_VISIBILITY_TIMEOUT']
+        )
+        click.echo(f"running {worker.workers} workers, handlers: {', '.join(sorted(queue.HANDLERS))}")
+        worker.run(burst=burst)
+        click.echo(f"{worker.processed} jobs done, {worker.failed} failed, {worker.errors} batch errors")
@@ -0,0 +1,27 @@
+from ..utils import db
+from datetime import datetime
+
+
+class IdempotencyKey(db.Model):
+    """
+        The response of a write made with an Idempotency-Key header,
+        replayed to retries of the same request until it expires
+    """
+    __tablename__ = 'idempotency_keys'
+    id = db.Column(db.Integer(), primary_key=True)
+    user_id = db.Column(db.Integer(), db.ForeignKey('users.id'), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    #method, path and body of the first request, a retry must match it
+    fingerprint = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.Integer(), nullable=False)
+    response = db.Column(db.Text(), nullable=False)
+    date_created = db.Column(db.DateTime(), default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime(), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_idempotency_keys_user_id_key', 'user_id', 'key', unique=True),
+        db.Index('ix_idempotency_keys_expires_at', 'expires_at'),
+    )
+
+    def __repr__(self):
+        return f"<IdempotencyKey {self.user_id} {self.key}>"
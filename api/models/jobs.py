@@ -0,0 +1,30 @@
+from ..utils import db
+from datetime import datetime
+
+
+class Job(db.Model):
+    """
+        One unit of background work. Done jobs are deleted, the ones that run
+        out of attempts stay behind as FAILED
+    """
+    __tablename__ = 'jobs'
+    id = db.Column(db.Integer(), primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text(), nullable=False, default='{}')
+    status = db.Column(db.String(20), nullable=False, default='QUEUED')
+    attempts = db.Column(db.Integer(), nullable=False, default=0)
+    max_attempts = db.Column(db.Integer(), nullable=False, default=5)
+    #not claimed before this, moved forward by the retry backoff
+    available_at = db.Column(db.DateTime(), nullable=False, default=datetime.utcnow)
+    #a claimed job comes back to the queue when this passes without an ack
+    locked_until = db.Column(db.DateTime())
+    locked_by = db.Column(db.String(100))
+    last_error = db.Column(db.Text())
+    date_created = db.Column(db.DateTime(), default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_jobs_status_available_at', 'status', 'available_at'),
+    )
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.kind}>"
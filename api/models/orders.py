@@ -1,3 +1,4 @@
+from flask import abort
 from ..utils import db
 from enum import Enum
 from datetime import datetime
@@ -41,6 +42,20 @@ class OrderStatus(Enum):
     CANCELED = "Canceled"  # Order was canceled
     RETURNED = "Returned"  # Order was returned by the customer
 
+    def can_become(self, status):
+        return status in ORDER_TRANSITIONS[self]
+
+
+#the statuses an order may move to from each status
+ORDER_TRANSITIONS = {
+    OrderStatus.PENDING: (OrderStatus.IN_PROGRESS, OrderStatus.CANCELED),
+    OrderStatus.IN_PROGRESS: (OrderStatus.SHIPPED, OrderStatus.CANCELED),
+    OrderStatus.SHIPPED: (OrderStatus.DELIVERED, OrderStatus.RETURNED),
+    OrderStatus.DELIVERED: (OrderStatus.RETURNED,),
+    OrderStatus.CANCELED: (),
+    OrderStatus.RETURNED: (),
+}
+
 
 class Order(db.Model):
     __tablename__ = 'orders'
@@ -57,6 +72,16 @@ class Order(db.Model):
     #user = db.Column(db.Integer(), db.ForeignKey('users.id'))
     user_id = db.Column(db.Integer(), db.ForeignKey('users.id'))
 
+    __table_args__ = (
+        db.Index('ix_orders_user_id_date_created', 'user_id', 'date_created'),
+        db.Index('ix_orders_order_status_date_created', 'order_status', 'date_created'),
+        #the sort keys of the order lists
+        db.Index('ix_orders_date_created', 'date_created'),
+        db.Index('ix_orders_date_updated', 'date_updated'),
+        #ids of deleted or archived orders are never handed out again
+        {'sqlite_autoincrement': True},
+    )
+
     def __repr__(self):
         return f"<Order {self.id}>"
     
@@ -66,8 +91,16 @@ class Order(db.Model):
 
 
     @classmethod
-    def get_by_id(cls,id):
-        return cls.query.get_or_404(id)
+    def get_by_id(cls,id, archived=True):
+        """
+            The order, or its archived copy when archived is true and it was moved
+        """
+        order = db.session.get(cls, id)
+        if order is None and archived:
+            order = db.session.get(ArchivedOrder, id)
+        if order is None:
+            abort(404)
+        return order
 
 
     def delete(self):
@@ -75,12 +108,47 @@ class Order(db.Model):
         db.session.commit()
 
 
+class ArchivedOrder(db.Model):
+    """
+        Closed orders moved out of orders by flask archive-orders, read only.
+        Same columns and ids as in orders
+    """
+    __tablename__ = 'orders_archive'
+    id = db.Column(db.Integer(), primary_key=True, autoincrement=False)
+    size = db.Column(db.Enum(Sizes))
+    color = db.Column(db.Enum(Colors))
+    design = db.Column(db.Enum(PrintDesigns))
+    material = db.Column(db.Enum(Materials))
+    order_status = db.Column(db.Enum(OrderStatus))
+    date_created = db.Column(db.DateTime())
+    date_updated = db.Column(db.DateTime())
+    quantity=db.Column(db.Integer())
+    user_id = db.Column(db.Integer(), db.ForeignKey('users.id'))
+    date_archived = db.Column(db.DateTime(), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_orders_archive_user_id_date_created', 'user_id', 'date_created'),
+        #the sort keys of the admin list with archived=true, like orders
+        db.Index('ix_orders_archive_date_created', 'date_created'),
+        db.Index('ix_orders_archive_date_updated', 'date_updated'),
+    )
+
+    def __repr__(self):
+        return f"<ArchivedOrder {self.id}>"
+
+
 class Resource(db.Model):
     __tablename__ = 'resources'
     id = db.Column(db.Integer(), primary_key=True)
     type = db.Column(db.String(20), nullable=False)
     name = db.Column(db.String(50), nullable=False)
     quantity = db.Column(db.Integer(), nullable=False)
+    #bumped on every write, lets the inventory cache notice changes
+    version = db.Column(db.Integer(), nullable=False, default=0, server_default='0')
+
+    __table_args__ = (
+        db.Index('ix_resources_type_name', 'type', 'name', unique=True),
+    )
 
     def __repr__(self):
         return f"<Resource {self.name}>"
@@ -95,4 +163,39 @@ class Resource(db.Model):
 
     def delete(self):
         db.session.delete(self)
-        db.session.commit()
\ No newline at end of file
+        db.session.commit()
+
+
+class ResourceShard(db.Model):
+    """
+        Part of the stock of a resource, used when STOCK_SHARDS is above 1.
+        The stock of a resource is its quantity plus the quantity of its shards
+    """
+    __tablename__ = 'resource_shards'
+    resource_id = db.Column(db.Integer(), db.ForeignKey('resources.id'), primary_key=True)
+    shard = db.Column(db.Integer(), primary_key=True)
+    quantity = db.Column(db.Integer(), nullable=False, default=0)
+    #bumped on every write like resources.version
+    version = db.Column(db.Integer(), nullable=False, default=0, server_default='0')
+
+    def __repr__(self):
+        return f"<ResourceShard {self.resource_id}/{self.shard}>"
+
+
+class OrderStats(db.Model):
+    """
+        Orders and hoodies per day and per status, size, color, design and
+        material, kept up to date by every order write
+    """
+    __tablename__ = 'order_stats'
+    day = db.Column(db.Date(), primary_key=True)
+    order_status = db.Column(db.String(20), primary_key=True)
+    size = db.Column(db.String(20), primary_key=True)
+    color = db.Column(db.String(20), primary_key=True)
+    design = db.Column(db.String(30), primary_key=True)
+    material = db.Column(db.String(20), primary_key=True)
+    orders = db.Column(db.Integer(), nullable=False, default=0)
+    quantity = db.Column(db.Integer(), nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<OrderStats {self.day} {self.order_status}>"
@@ -15,6 +15,10 @@ class User(db.Model):
     #relationship
     order = db.relationship('Order', backref="user_order", lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_users_userName', 'userName', unique=True),
+    )
+
 
 
 
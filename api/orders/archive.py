@@ -0,0 +1,113 @@
+#closed orders move to orders_archive once they are old, the reads that must still find them look there explicitly
+import time
+from datetime import datetime, timedelta
+import click
+from sqlalchemy import delete, func, insert, literal, select, union_all
+from ..models.orders import Order, ArchivedOrder, OrderStatus
+from ..utils import db
+from . import filters, serializers
+
+
+# nothing changes these orders any more, bar a late return of a delivered one
+CLOSED = (OrderStatus.DELIVERED, OrderStatus.CANCELED, OrderStatus.RETURNED)
+
+
+def archive_batch(cutoff, batch_size):
+    """
+        Move up to batch_size orders closed before cutoff in one transaction, return how many moved
+    """
+    # orders is AUTOINCREMENT on SQLite, the ids moved out are never handed out again
+    ids = db.session.execute(
+        select(Order.id)
+        .where(Order.order_status.in_(CLOSED), Order.date_updated < cutoff)
+        .order_by(Order.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+    if not ids:
+        db.session.rollback()
+        return 0
+
+    columns = [column.key for column in Order.__table__.c]
+    db.session.execute(
+        insert(ArchivedOrder).from_select(
+            columns + ['date_archived'],
+            select(*Order.__table__.c, literal(datetime.utcnow())).where(Order.id.in_(ids))
+        )
+    )
+    db.session.execute(delete(Order).where(Order.id.in_(ids)).execution_options(synchronize_session=False))
+    db.session.commit()
+    return len(ids)
+
+
+def archive(older_than, batch_size, report=None):
+    """
+        Move the orders closed more than older_than ago, batch by batch.
+        report is called with the size and seconds of every batch.
+        Returns (moved, batches)
+    """
+    cutoff = datetime.utcnow() - older_than
+    moved = batches = 0
+    while True:
+        start = time.perf_counter()
+        count = archive_batch(cutoff, batch_size)
+        if not count:
+            return moved, batches
+        moved += count
+        batches += 1
+        if report is not None:
+            report(count, time.perf_counter() - start)
+        if count < batch_size:
+            return moved, batches
+
+
+def orders(args, user_id=None):
+    """
+        The orders, the user's only when user_id is given, from orders and
+        orders_archive as one statement, filtered by args, with the keys
+        and direction to sort it by
+    """
+    hot, cold = serializers.order_select(), serializers.order_select(ArchivedOrder)
+    if user_id is not None:
+        hot, cold = hot.where(Order.user_id == user_id), cold.where(ArchivedOrder.user_id == user_id)
+    hot, keys, descending = filters.apply(hot, args)
+    cold, _, _ = filters.apply(cold, args, ArchivedOrder)
+    both = union_all(hot, cold).subquery()
+    return select(*both.c), tuple(both.c[key.key] for key in keys), descending
+
+
+def user_orders(user_id, args):
+    return orders(args, user_id)
+
+
+def user_stamp(user_id):
+    """
+        Changes whenever an order of the user is added, written to or removed, moving it to the archive included
+    """
+    both = union_all(
+        select(Order.id, Order.date_updated).where(Order.user_id == user_id),
+        select(ArchivedOrder.id, ArchivedOrder.date_updated).where(ArchivedOrder.user_id == user_id)
+    ).subquery()
+    return tuple(db.session.execute(
+        select(func.count(both.c.id), func.sum(both.c.id), func.max(both.c.date_updated))
+    ).one())
+
+
+def register_commands(app):
+
+    @app.cli.command('archive-orders')
+    @click.option('--older-than', type=int, help="days since the order closed, ARCHIVE_AFTER_DAYS by default")
+    @click.option('--batch-size', type=int, help="orders per transaction, ARCHIVE_BATCH_SIZE by default")
+    def archive_orders(older_than, batch_size):
+        """
+            Move the closed orders older than ARCHIVE_AFTER_DAYS to orders_archive
+        """
+        days = older_than if older_than is not None else app.config['ARCHIVE_AFTER_DAYS']
+        size = batch_size or app.config['ARCHIVE_BATCH_SIZE']
+        start = time.perf_counter()
+        moved, batches = archive(
+            timedelta(days=days), size,
+            report=lambda count, seconds: click.echo(f"moved {count} orders in {seconds:.2f}s")
+        )
+        click.echo(f"archived {moved} orders closed over {days} days ago in {batches} batches "
+                   f"in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,67 @@
+#streamed order exports, memory stays flat however many orders there are
+import csv
+import io
+import json
+from flask import current_app
+from sqlalchemy import select, union_all
+from ..models.orders import Order, ArchivedOrder
+from ..utils import db
+
+
+EXPORT_COLUMNS = ['id', 'quantity', 'size', 'order_status', 'color', 'design', 'material',
+                  'date_created', 'date_updated', 'user_id']
+
+
+def _value(value):
+    # same strings as the order_model fields
+    if value is None or isinstance(value, (int, str)):
+        return value
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def export_query(status=None, created_from=None, created_to=None):
+    """
+        Every order matching the filters, the archived ones included, by id
+    """
+    parts = []
+    for model in (Order, ArchivedOrder):
+        stmt = select(*(model.__table__.c[name] for name in EXPORT_COLUMNS))
+        if status is not None:
+            stmt = stmt.where(model.order_status == status)
+        if created_from is not None:
+            stmt = stmt.where(model.date_created >= created_from)
+        if created_to is not None:
+            stmt = stmt.where(model.date_created < created_to)
+        parts.append(stmt)
+    both = union_all(*parts).subquery()
+    return select(*both.c).order_by(both.c.id)
+
+
+def _rows(stmt):
+    batch = current_app.config['EXPORT_BATCH_SIZE']
+    result = db.session.execute(stmt.execution_options(yield_per=batch))
+    for partition in result.partitions():
+        yield partition
+
+
+def ndjson_lines(stmt):
+    for partition in _rows(stmt):
+        yield ''.join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, map(_value, row)))) + '\n' for row in partition
+        )
+
+
+def csv_lines(stmt):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for partition in _rows(stmt):
+        writer.writerows([_value(v) for v in row] for row in partition)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # the header alone when nothing matched
+    if buffer.tell():
+        yield buffer.getvalue()
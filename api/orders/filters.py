@@ -0,0 +1,96 @@
+#the filter and sort query parameters of the order lists, compiled to one WHERE ... ORDER BY
+from flask import request
+from flask_restx import inputs
+from werkzeug.exceptions import BadRequest
+from ..models.orders import Order, OrderStatus, Sizes, Colors, PrintDesigns, Materials
+from ..utils.pagination import pagination_parser
+
+
+ENUM_FILTERS = {
+    'status': (Order.order_status, OrderStatus),
+    'size': (Order.size, Sizes),
+    'color': (Order.color, Colors),
+    'design': (Order.design, PrintDesigns),
+    'material': (Order.material, Materials),
+}
+
+# from is inclusive, to is exclusive
+RANGE_FILTERS = {
+    'created_from': (Order.date_created, 'from'),
+    'created_to': (Order.date_created, 'to'),
+    'updated_from': (Order.date_updated, 'from'),
+    'updated_to': (Order.date_updated, 'to'),
+}
+
+# only columns an index can return in order, id breaks the ties
+SORT_KEYS = {
+    'date_created': Order.date_created,
+    'date_updated': Order.date_updated,
+    'id': Order.id,
+}
+DEFAULT_SORT = 'date_created'
+
+
+def _enum_list(enum):
+    def parse(value):
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        if not names or any(name not in enum.__members__ for name in names):
+            raise ValueError(f"got {value!r}, expected {', '.join(enum.__members__)}")
+        return [enum[name] for name in names]
+    return parse
+
+
+def _sort(value):
+    name = value[1:] if value.startswith('-') else value
+    if name not in SORT_KEYS:
+        if name in Order.__table__.c:
+            raise ValueError(f"got {name}, it has no index to sort by")
+        raise ValueError(f"got unknown field {name}")
+    return name, value.startswith('-')
+
+
+order_list_parser = pagination_parser.copy()
+for name, (column, enum) in ENUM_FILTERS.items():
+    order_list_parser.add_argument(name, type=_enum_list(enum), location='args',
+                                   help=f"only these {column.key} values, comma separated.")
+for name, (column, side) in RANGE_FILTERS.items():
+    order_list_parser.add_argument(name, type=inputs.datetime_from_iso8601, location='args',
+                                   help=f"only orders with {column.key} {'at or after' if side == 'from' else 'before'} this ISO 8601 date.")
+order_list_parser.add_argument('archived', type=inputs.boolean, default=False, location='args',
+                               help="GET /orders/ only: include the archived orders, the orders of a user always include them.")
+order_list_parser.add_argument('sort', type=_sort, location='args',
+                               help=f"{', '.join(SORT_KEYS)}, prefixed with - for descending. {DEFAULT_SORT} by default.")
+
+
+def parse_args():
+    """
+        The list arguments, unknown query parameters are a 400 instead of being ignored
+    """
+    known = {argument.name for argument in order_list_parser.args}
+    unknown = sorted(set(request.args) - known)
+    if unknown:
+        raise BadRequest(f"Unknown query parameter {', '.join(unknown)}, expected some of {', '.join(sorted(known))}")
+    return order_list_parser.parse_args()
+
+
+def apply(stmt, args, model=Order):
+    """
+        stmt filtered by args and the keyset keys and direction it is sorted by.
+        model is Order or a table with the same columns, e.g. ArchivedOrder
+    """
+    criteria = []
+    for name, (column, enum) in ENUM_FILTERS.items():
+        if args.get(name):
+            criteria.append(getattr(model, column.key).in_(args[name]))
+    for name, (column, side) in RANGE_FILTERS.items():
+        if args.get(name) is not None:
+            column = getattr(model, column.key)
+            criteria.append(column >= args[name] if side == 'from' else column < args[name])
+
+    name, descending = args.get('sort') or (DEFAULT_SORT, False)
+    keys = (SORT_KEYS[name],) if name == 'id' else (SORT_KEYS[name], Order.id)
+    return stmt.where(*criteria), tuple(getattr(model, key.key) for key in keys), descending
+
+
+def ordered(stmt, keys, descending):
+    return stmt.order_by(*(key.desc() for key in keys)) if descending else stmt.order_by(*keys)
@@ -0,0 +1,183 @@
+#in memory mirror of the resources table, kept up to date by the app's own writes
+import time
+from collections import namedtuple
+from threading import Lock
+from flask import current_app
+from sqlalchemy import DDL, and_, event, func, or_, select
+from ..models.orders import Resource
+from ..utils import db
+from . import shards
+
+
+Entry = namedtuple('Entry', ['id', 'quantity', 'version'])
+
+
+# every write bumps resources.version: the app does it itself, this trigger
+# catches the ones made straight in the database
+event.listen(
+    Resource.__table__, 'after_create',
+    DDL("""
+        CREATE TRIGGER IF NOT EXISTS resources_bump_version AFTER UPDATE ON resources
+        WHEN NEW.version = OLD.version
+        BEGIN
+            UPDATE resources SET version = OLD.version + 1 WHERE id = NEW.id;
+        END
+    """).execute_if(dialect='sqlite')
+)
+
+
+@event.listens_for(Resource, 'before_update')
+def _bump_version(mapper, connection, target):
+    target.version = (target.version or 0) + 1
+
+
+def table_stamp():
+    """
+        Changes whenever a resource is added, removed or written to
+    """
+    versions = func.coalesce(func.sum(Resource.version), 0)
+    if shards.enabled():
+        versions = versions + shards.version_sum()
+    return tuple(db.session.execute(
+        select(func.count(Resource.id), versions, func.max(Resource.id))
+    ).one())
+
+
+class InventoryCache:
+    """
+        Availability by (type, name). The whole table is mirrored, so the
+        mirror can tell from one aggregate query, made at most every
+        check_interval seconds, whether someone else wrote to the table.
+    """
+
+    def __init__(self, check_interval=1.0):
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self._entries = None
+        self._checked_at = 0.0
+        self._lock = Lock()
+
+    @staticmethod
+    def _stamp(entries):
+        entries = entries.values()
+        return (len(entries), sum(e.version for e in entries), max((e.id for e in entries), default=None))
+
+    @staticmethod
+    def _load():
+        return {
+            (r.type, r.name): Entry(r.id, r.quantity, r.version)
+            for r in db.session.execute(shards.stock_select())
+        }
+
+    def _fresh(self):
+        """
+            The mirror, reloaded if the database moved under it, and whether it was fresh.
+            The queries run outside the lock: under AsyncApp a request
+            waiting on the database gives the thread to the others
+        """
+        now = time.monotonic()
+        with self._lock:
+            entries = self._entries
+            if entries is not None:
+                if now - self._checked_at < self.check_interval:
+                    return entries, True
+                # the others keep using the mirror while this request checks it
+                self._checked_at = now
+        if entries is not None and table_stamp() == self._stamp(entries):
+            return entries, True
+        entries = self._load()
+        with self._lock:
+            self._entries = entries
+            self._checked_at = now
+        return entries, False
+
+    def available(self, keys):
+        """
+            The quantity of each (type, name) key, 0 for unknown resources
+        """
+        entries, fresh = self._fresh()
+        with self._lock:
+            if fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return {key: entries[key].quantity if key in entries else 0 for key in keys}
+
+    def write_through(self, rows):
+        """
+            Rows are committed (id, type, name, quantity, version) values
+        """
+        with self._lock:
+            if self._entries is None:
+                return
+            # a new dict, the readers hold on to the one they got outside the lock
+            entries = dict(self._entries)
+            for row in rows:
+                stale = [k for k, e in entries.items() if e.id == row.id]
+                # a concurrent writer committed a newer version already
+                if any(entries[k].version > row.version for k in stale):
+                    continue
+                for key in stale:
+                    del entries[key]
+                entries[(row.type, row.name)] = Entry(row.id, row.quantity, row.version)
+            self._entries = entries
+
+    def clear(self):
+        with self._lock:
+            self._entries = None
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'size': len(self._entries) if self._entries is not None else 0}
+
+
+def init_app(app):
+    if app.config['INVENTORY_CACHE_ENABLED']:
+        app.extensions['inventory'] = InventoryCache(app.config['INVENTORY_CACHE_CHECK_INTERVAL'])
+
+
+def get_cache():
+    """
+        None when INVENTORY_CACHE_ENABLED is off
+    """
+    return current_app.extensions.get('inventory')
+
+
+def _read(keys):
+    return db.session.execute(
+        shards.stock_select()
+        .where(or_(*(and_(Resource.type == type, Resource.name == name) for type, name in keys)))
+    ).all()
+
+
+def available(keys):
+    """
+        The quantity of each (type, name) key, from the cache when it is on
+    """
+    keys = list(keys)
+    cache = get_cache()
+    if cache is not None:
+        return cache.available(keys)
+
+    quantities = {(r.type, r.name): r.quantity for r in _read(keys)}
+    return {key: quantities.get(key, 0) for key in keys}
+
+
+def confirm(keys):
+    """
+        The quantity of each key read from the database, the mirror takes
+        the rows too. Only SQLite bumps the version of a write made
+        outside the app, elsewhere the mirror can't notice it by itself
+    """
+    keys = list(keys)
+    rows = _read(keys)
+    write_through(rows)
+    quantities = {(r.type, r.name): r.quantity for r in rows}
+    return {key: quantities.get(key, 0) for key in keys}
+
+
+def write_through(rows):
+    cache = get_cache()
+    if cache is not None:
+        cache.write_through(rows)
@@ -0,0 +1,336 @@
+#stock reservation for orders: every write is one transaction with one commit
+from collections import Counter, defaultdict
+from datetime import datetime
+from enum import Enum
+from sqlalchemy import and_, insert, or_, update
+from werkzeug.exceptions import BadRequest, Conflict
+from ..models.orders import Order, Resource, OrderStatus, Sizes, Colors, PrintDesigns, Materials
+from ..jobs import queue
+from ..utils import db
+from . import inventory, serializers, shards, validation
+from .stats import StatsDelta, order_key, stats_key
+
+
+# orders in these states hold color and material stock that is not consumed yet
+HOLDS_STOCK = (OrderStatus.PENDING, OrderStatus.IN_PROGRESS)
+# moving an order to these states puts its color and material back in stock
+RESTORES_STOCK = (OrderStatus.CANCELED, OrderStatus.RETURNED)
+
+
+class OutOfStock(BadRequest):
+    description = "Order not feasible due to resource constraints"
+
+
+class BatchRejected(BadRequest):
+    description = "Batch rejected, no order was created"
+
+    def __init__(self, results):
+        super().__init__()
+        self.data = {'message': self.description, 'results': results}
+
+
+class TransitionRejected(BatchRejected):
+    description = "Transition rejected, no order status was changed"
+
+
+def _name(value):
+    return value.name if isinstance(value, Enum) else value
+
+
+def _adjust(type, name, delta):
+    """
+        Add delta to a resource, refusing to go below zero in the same statement
+    """
+    if shards.enabled():
+        row = shards.adjust(type, _name(name), delta)
+    else:
+        stmt = (
+            update(Resource)
+            .where(Resource.type == type, Resource.name == _name(name))
+            .values(quantity=Resource.quantity + delta, version=Resource.version + 1)
+            .returning(Resource.id, Resource.type, Resource.name, Resource.quantity, Resource.version)
+            .execution_options(synchronize_session=False)
+        )
+        if delta < 0:
+            stmt = stmt.where(Resource.quantity >= -delta)
+        row = db.session.execute(stmt).first()
+    if row is None:
+        return False
+    # handed to the inventory cache once the transaction commits
+    db.session.info.setdefault('inventory_rows', []).append(row)
+    return True
+
+
+def reserve(color, material, quantity):
+    if not _adjust('COLOR', color, -quantity) or not _adjust('MATERIAL', material, -quantity):
+        raise OutOfStock()
+
+
+def release(color, material, quantity):
+    _adjust('COLOR', color, quantity)
+    _adjust('MATERIAL', material, quantity)
+
+
+def _commit(work, before_commit=None):
+    db.session.info.pop('inventory_rows', None)
+    try:
+        result = work()
+        if before_commit is not None:
+            # e.g. the stored response of an idempotent request, part of the same transaction
+            before_commit(result)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        db.session.info.pop('inventory_rows', None)
+        raise
+    inventory.write_through(db.session.info.pop('inventory_rows', []))
+    return result
+
+
+def _check_stock(needed):
+    """
+        The keys of needed, a {(type, name): quantity} dict, that are short.
+        The cache is only a hint: what it says is short is read again from
+        the database before an order is turned down
+    """
+    available = inventory.available(needed)
+    short = {key for key, quantity in needed.items() if available[key] < quantity}
+    if short and inventory.get_cache() is not None:
+        available = inventory.confirm(short)
+        short = {key for key in short if available[key] < needed[key]}
+    return short
+
+
+def create_order(user_id, data, before_commit=None):
+    """
+        Reserve the stock and insert the order.
+        before_commit is called with the flushed order before the commit
+    """
+    validation.order(data)
+    # fail fast on what is known to be out of stock, the update below decides
+    if _check_stock({('COLOR', data['color']): data['quantity'], ('MATERIAL', data['material']): data['quantity']}):
+        raise OutOfStock()
+
+    def work():
+        reserve(data['color'], data['material'], data['quantity'])
+        now = datetime.utcnow()
+        # members rather than names, so the order renders the same before and after the commit
+        order = Order(
+            size = Sizes[data['size']],
+            quantity = data['quantity'],
+            color = Colors[data['color']],
+            design = PrintDesigns[data['design']],
+            material = Materials[data['material']],
+            user_id = user_id,
+            date_created = now,
+            date_updated = now
+        )
+        db.session.add(order)
+        delta = StatsDelta()
+        delta.add(order_key(order), order.quantity)
+        delta.apply()
+        # the follow-up work runs on the worker, it is queued only if the order commits
+        db.session.flush()
+        queue.enqueue('order_created', {'order_ids': [order.id]})
+        return order
+
+    return _commit(work, before_commit)
+
+
+def update_order(order, data):
+    """
+        Give back the stock of the order as it was, then reserve it as it will be
+    """
+    validation.order(data)
+
+    def work():
+        if order.order_status in HOLDS_STOCK:
+            release(order.color, order.material, order.quantity)
+        reserve(data['color'], data['material'], data['quantity'])
+        delta = StatsDelta()
+        delta.move(order_key(order), order.quantity,
+                   order_key(order, size=data['size'], color=data['color'],
+                             design=data['design'], material=data['material']), data['quantity'])
+        delta.apply()
+        order.quantity = data['quantity']
+        order.size = data['size']
+        order.color = data['color']
+        order.design = data['design']
+        order.material = data['material']
+        return order
+
+    return _commit(work)
+
+
+def delete_order(order):
+    """
+        Delete the order, giving back the stock it still holds
+    """
+    def work():
+        if order.order_status in HOLDS_STOCK:
+            release(order.color, order.material, order.quantity)
+        delta = StatsDelta()
+        delta.remove(order_key(order), order.quantity)
+        delta.apply()
+        db.session.delete(order)
+
+    _commit(work)
+
+
+def _status(value):
+    if isinstance(value, OrderStatus):
+        return value
+    if value not in OrderStatus.__members__:
+        raise BadRequest(f"Invalid order_status : {value}")
+    return OrderStatus[value]
+
+
+def _transition_error(row, status):
+    if row is None:
+        return "Order not found"
+    current = OrderStatus[row.order_status]
+    if not current.can_become(status):
+        return f"An order can't go from {current.name} to {status.name}"
+    return None
+
+
+def change_statuses(order_ids, status):
+    """
+        Move every order to status or none of them.
+        The orders are read with one SELECT and moved with one
+        UPDATE ... WHERE id IN, canceled and returned orders give their
+        stock back with one update per color and material.
+    """
+    status = _status(status)
+    ids = list(dict.fromkeys(order_ids))
+    rows = {row.id: row for row in db.session.execute(serializers.order_select().where(Order.id.in_(ids)))}
+
+    errors = [_transition_error(rows.get(order_id), status) for order_id in ids]
+    if any(errors):
+        db.session.rollback()
+        raise TransitionRejected([
+            {'id': order_id, 'changed': False, 'message': error or "Valid, not changed"}
+            for order_id, error in zip(ids, errors)
+        ])
+
+    def work():
+        now = datetime.utcnow()
+        # only from the status each order was read in, so a concurrent change can't slip through
+        seen = defaultdict(list)
+        for row in rows.values():
+            seen[row.order_status].append(row.id)
+        updated = db.session.execute(
+            update(Order)
+            .where(or_(*(and_(Order.order_status == OrderStatus[name], Order.id.in_(group))
+                         for name, group in seen.items())))
+            .values(order_status=status, date_updated=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if updated != len(ids):
+            raise Conflict("Some of the orders changed meanwhile, none was updated")
+
+        if status in RESTORES_STOCK:
+            restored = Counter()
+            for row in rows.values():
+                restored[('COLOR', row.color)] += row.quantity
+                restored[('MATERIAL', row.material)] += row.quantity
+            # in (type, name) order like create_orders, so a cancel and a cart can't deadlock
+            for (type, name), quantity in sorted(restored.items()):
+                _adjust(type, name, quantity)
+
+        delta = StatsDelta()
+        for row in rows.values():
+            delta.move(stats_key(row.order_status, row.size, row.color, row.design, row.material, row.date_created),
+                       row.quantity,
+                       stats_key(status, row.size, row.color, row.design, row.material, row.date_created),
+                       row.quantity)
+        delta.apply()
+        queue.enqueue('order_status_changed', {'order_ids': ids, 'order_status': status.name})
+
+        return serializers.serialize_orders(
+            (row.id, row.quantity, row.size, status.name, row.color, row.design, row.material,
+             row.date_created, now)
+            for row in (rows[order_id] for order_id in ids)
+        )
+
+    return _commit(work)
+
+
+def change_status(order, status):
+    """
+        Move the order to another status
+    """
+    change_statuses([order.id], status)
+    return order
+
+
+def check_orders(items):
+    """
+        Reject the whole cart when any of its orders is invalid, with the error of each
+    """
+    errors = validation.order.errors(items)
+    if any(errors):
+        raise BatchRejected([
+            {'index': i, 'created': False, 'message': error or "Valid, not created"}
+            for i, error in enumerate(errors)
+        ])
+
+
+def create_orders(user_id, items, before_commit=None):
+    """
+        Create every order of a cart or none of them.
+        The stock of the whole cart is checked at once, taken with one
+        conditional update per color and material and the orders are inserted
+        with a single executemany. before_commit is called with the created
+        rows before the commit.
+    """
+    check_orders(items)
+
+    needed = Counter()
+    for item in items:
+        needed[('COLOR', item['color'])] += item['quantity']
+        needed[('MATERIAL', item['material'])] += item['quantity']
+
+    short = _check_stock(needed)
+    if short:
+        db.session.rollback()
+        raise BatchRejected([_short_result(i, item, short) for i, item in enumerate(items)])
+
+    def work():
+        # the rows are locked in (type, name) order, COLOR before MATERIAL as reserve() does,
+        # so two carts, or a cart and a single order, can't wait on each other
+        for (type, name), quantity in sorted(needed.items()):
+            # someone else took the stock since it was checked
+            if not _adjust(type, name, -quantity):
+                raise OutOfStock()
+        now = datetime.utcnow()
+        rows = [{
+            'size': item['size'],
+            'quantity': item['quantity'],
+            'color': item['color'],
+            'design': item['design'],
+            'material': item['material'],
+            'user_id': user_id,
+            'date_created': now,
+            'date_updated': now
+        } for item in items]
+        delta = StatsDelta()
+        for row in rows:
+            delta.add(stats_key(None, row['size'], row['color'], row['design'], row['material'], now), row['quantity'])
+        delta.apply()
+        # plain rows, so nothing is expired and reloaded by the commit, in cart order
+        created = db.session.execute(
+            insert(Order).returning(*Order.__table__.c, sort_by_parameter_order=True), rows
+        ).all()
+        queue.enqueue('order_created', {'order_ids': [row.id for row in created]})
+        return created
+
+    return _commit(work, before_commit)
+
+
+def _short_result(index, item, short):
+    missing = [f"{type.lower()} {name}" for type, name in
+               (('COLOR', item['color']), ('MATERIAL', item['material'])) if (type, name) in short]
+    if missing:
+        return {'index': index, 'created': False, 'message': "Not enough stock for " + " and ".join(missing)}
+    return {'index': index, 'created': False, 'message': "Valid, not created"}
@@ -0,0 +1,91 @@
+#list responses without hydrating ORM objects or walking restx fields per row.
+#the output is the same as marshal(..., order_model) / marshal(..., resource_model)
+from sqlalchemy import String, select, type_coerce
+from ..models.orders import Order, Sizes, Colors, PrintDesigns, Materials, OrderStatus
+from ..utils import db
+from . import shards
+
+
+# stored enum name -> the string order_model renders for the member, e.g. 'BLACK' -> 'Colors.BLACK'
+def _labels(enum):
+    return {member.name: str(member) for member in enum}
+
+
+SIZE_LABELS = _labels(Sizes)
+COLOR_LABELS = _labels(Colors)
+DESIGN_LABELS = _labels(PrintDesigns)
+MATERIAL_LABELS = _labels(Materials)
+STATUS_LABELS = _labels(OrderStatus)
+
+
+def _raw(column):
+    # the stored name as a plain string, skipping the Enum result processing
+    return type_coerce(column, String).label(column.key)
+
+
+def order_columns(model):
+    return (
+        model.id,
+        model.quantity,
+        _raw(model.size),
+        _raw(model.order_status),
+        _raw(model.color),
+        _raw(model.design),
+        _raw(model.material),
+        model.date_created,
+        model.date_updated,
+    )
+
+
+ORDER_COLUMNS = order_columns(Order)
+
+def order_select(model=Order):
+    """
+        model is Order or ArchivedOrder, the rows render the same
+    """
+    return select(*(ORDER_COLUMNS if model is Order else order_columns(model)))
+
+
+def resource_select():
+    # the quantity is summed over the stock shards when they are on
+    return shards.stock_select(version=False)
+
+
+def serialize_orders(rows):
+    sizes, statuses, colors, designs, materials = (
+        SIZE_LABELS, STATUS_LABELS, COLOR_LABELS, DESIGN_LABELS, MATERIAL_LABELS
+    )
+    return [
+        {
+            'id': id,
+            'quantity': quantity,
+            'size': sizes.get(size),
+            'order_status': statuses.get(status),
+            'color': colors.get(color),
+            'design': designs.get(design),
+            'material': materials.get(material),
+            'date_created': created.isoformat() if created is not None else None,
+            'date_updated': updated.isoformat() if updated is not None else None,
+        }
+        for id, quantity, size, status, color, design, material, created, updated in rows
+    ]
+
+
+def serialize_resources(rows):
+    return [
+        {
+            'id': id,
+            'type': str(type) if type is not None else None,
+            'name': str(name) if name is not None else None,
+            'quantity': quantity,
+        }
+        for id, type, name, quantity in rows
+    ]
+
+
+def orders(*criteria):
+    return serialize_orders(db.session.execute(order_select().where(*criteria)))
+
+
+def resources(*criteria):
+    return serialize_resources(db.session.execute(resource_select().where(*criteria)))
@@ -0,0 +1,234 @@
+#sharded stock: with STOCK_SHARDS above 1 the stock of a resource is spread over
+#that many resource_shards rows, so concurrent orders of one color update different rows
+import random
+import time
+import click
+from flask import current_app
+from sqlalchemy import bindparam, delete, func, insert, select, update
+from ..models.orders import Resource, ResourceShard
+from ..utils import db
+
+
+def shard_count():
+    return current_app.config['STOCK_SHARDS']
+
+
+def enabled():
+    return shard_count() > 1
+
+
+def stock_select(version=True):
+    """
+        id, type, name and quantity (and version) of the resources, the
+        shards added in when sharding is on
+    """
+    if not enabled():
+        columns = (Resource.id, Resource.type, Resource.name, Resource.quantity)
+        return select(*columns, Resource.version) if version else select(*columns)
+
+    totals = (
+        select(ResourceShard.resource_id,
+               func.sum(ResourceShard.quantity).label('quantity'),
+               func.sum(ResourceShard.version).label('version'))
+        .group_by(ResourceShard.resource_id)
+        .subquery()
+    )
+    columns = (Resource.id, Resource.type, Resource.name,
+               (Resource.quantity + func.coalesce(totals.c.quantity, 0)).label('quantity'))
+    if version:
+        columns += ((Resource.version + func.coalesce(totals.c.version, 0)).label('version'),)
+    return select(*columns).outerjoin(totals, totals.c.resource_id == Resource.id)
+
+
+def version_sum():
+    """
+        Sum of the shard versions, part of inventory.table_stamp
+    """
+    return func.coalesce(select(func.sum(ResourceShard.version)).scalar_subquery(), 0)
+
+
+def _take(resource_id, shard, quantity):
+    return db.session.execute(
+        update(ResourceShard)
+        .where(ResourceShard.resource_id == resource_id, ResourceShard.shard == shard,
+               ResourceShard.quantity >= quantity)
+        .values(quantity=ResourceShard.quantity - quantity, version=ResourceShard.version + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+
+
+def _take_unsharded(resource_id, quantity):
+    return db.session.execute(
+        update(Resource)
+        .where(Resource.id == resource_id, Resource.quantity >= quantity)
+        .values(quantity=Resource.quantity - quantity, version=Resource.version + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+
+
+def _gather(resource_id, quantity):
+    """
+        Take quantity from several rows of the resource, locking them all.
+        Only needed when no single row holds enough
+    """
+    unsharded = db.session.execute(
+        select(Resource.quantity).where(Resource.id == resource_id).with_for_update()
+    ).scalar()
+    shards = db.session.execute(
+        select(ResourceShard.shard, ResourceShard.quantity)
+        .where(ResourceShard.resource_id == resource_id, ResourceShard.quantity > 0)
+        .order_by(ResourceShard.quantity.desc())
+        .with_for_update()
+    ).all()
+    if unsharded + sum(row.quantity for row in shards) < quantity:
+        return False
+    for row in shards:
+        part = min(row.quantity, quantity)
+        # still conditional, the caller rolls back when any of them misses
+        if not _take(resource_id, row.shard, part):
+            return False
+        quantity -= part
+        if not quantity:
+            return True
+    return _take_unsharded(resource_id, quantity)
+
+
+def adjust(type, name, delta):
+    """
+        Add delta to one row of the resource, refusing to go below zero.
+        Stock is taken from the first shard, in random order, that holds
+        enough, then from the unsharded quantity, then from several rows.
+        Returned stock goes to a random shard. Returns the resource as
+        stock_select() renders it, None when it is short.
+    """
+    resource_id = db.session.execute(
+        select(Resource.id).where(Resource.type == type, Resource.name == name)
+    ).scalar()
+    if resource_id is None:
+        return None
+
+    shards = random.sample(range(shard_count()), shard_count())
+    if delta > 0:
+        added = db.session.execute(
+            update(ResourceShard)
+            .where(ResourceShard.resource_id == resource_id, ResourceShard.shard == shards[0])
+            .values(quantity=ResourceShard.quantity + delta, version=ResourceShard.version + 1)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not added:
+            # not spread yet, see rebalance
+            db.session.execute(
+                update(Resource)
+                .where(Resource.id == resource_id)
+                .values(quantity=Resource.quantity + delta, version=Resource.version + 1)
+                .execution_options(synchronize_session=False)
+            )
+    elif not (any(_take(resource_id, shard, -delta) for shard in shards)
+              or _take_unsharded(resource_id, -delta)
+              or _gather(resource_id, -delta)):
+        return None
+
+    return db.session.execute(stock_select().where(Resource.id == resource_id)).first()
+
+
+def spread(resource_id, total, count):
+    """
+        Set the stock of the resource to total, split evenly over count
+        shards. With count 1 the shards are dropped and the resource row
+        holds it all again. The versions only go up, so the inventory cache
+        notices the change.
+    """
+    existing = dict(db.session.execute(
+        select(ResourceShard.shard, ResourceShard.version)
+        .where(ResourceShard.resource_id == resource_id)
+        .with_for_update()
+    ).all())
+    keep = count if count > 1 else 0
+    parts = [total // keep + (1 if i < total % keep else 0) for i in range(keep)] if keep else []
+
+    table = ResourceShard.__table__
+    updates = [{'b_shard': shard, 'b_quantity': part} for shard, part in enumerate(parts) if shard in existing]
+    if updates:
+        db.session.execute(
+            update(table)
+            .where(table.c.resource_id == resource_id, table.c.shard == bindparam('b_shard'))
+            .values(quantity=bindparam('b_quantity'), version=table.c.version + 1),
+            updates
+        )
+    inserts = [{'resource_id': resource_id, 'shard': shard, 'quantity': part}
+               for shard, part in enumerate(parts) if shard not in existing]
+    if inserts:
+        db.session.execute(insert(ResourceShard), inserts)
+    retired = {shard: version for shard, version in existing.items() if shard >= keep}
+    if retired:
+        db.session.execute(
+            delete(ResourceShard)
+            .where(ResourceShard.resource_id == resource_id, ResourceShard.shard.in_(retired))
+            .execution_options(synchronize_session=False)
+        )
+    db.session.execute(
+        update(Resource)
+        .where(Resource.id == resource_id)
+        # the retired versions move to the resource, so the sum never goes back
+        .values(quantity=0 if keep else total, version=Resource.version + 1 + sum(retired.values()))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def set_stock(resource):
+    """
+        Spread the quantity just set on a resource over its shards, when sharding is on
+    """
+    if enabled():
+        db.session.flush()
+        spread(resource.id, resource.quantity, shard_count())
+
+
+def _rows(resource_id):
+    """
+        The unsharded quantity of the resource followed by its shards, locked
+    """
+    unsharded = db.session.execute(
+        select(Resource.quantity).where(Resource.id == resource_id).with_for_update()
+    ).scalar()
+    shards = db.session.execute(
+        select(ResourceShard.quantity)
+        .where(ResourceShard.resource_id == resource_id)
+        .order_by(ResourceShard.shard)
+        .with_for_update()
+    ).scalars().all()
+    return [unsharded] + shards
+
+
+def rebalance(count):
+    """
+        Spread the stock of every resource evenly over count shards, one
+        transaction per resource. Returns {resource id: (before, after)},
+        the quantities as _rows lists them
+    """
+    changes = {}
+    for resource_id in db.session.execute(select(Resource.id).order_by(Resource.id)).scalars().all():
+        before = _rows(resource_id)
+        spread(resource_id, sum(before), count)
+        changes[resource_id] = (before, _rows(resource_id))
+        db.session.commit()
+    return changes
+
+
+def register_commands(app):
+
+    @app.cli.command('rebalance-stock')
+    @click.option('--shards', type=int, help="shards per resource, STOCK_SHARDS by default")
+    def rebalance_stock(shards):
+        """
+            Spread the stock evenly over the shards, 1 folds the shards back into the resources
+        """
+        count = shards if shards is not None else shard_count()
+        if count < 1:
+            raise click.BadParameter("must be at least 1", param_hint='--shards')
+        start = time.perf_counter()
+        changes = rebalance(count)
+        for resource_id, (before, after) in changes.items():
+            click.echo(f"resource {resource_id}: {before} -> {after}")
+        click.echo(f"rebalanced {len(changes)} resources over {count} shards "
+                   f"in {time.perf_counter() - start:.2f}s")
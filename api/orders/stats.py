@@ -0,0 +1,228 @@
+#the order_stats summary table: maintained by the write paths, rebuilt by a command
+from collections import Counter
+from enum import Enum
+import click
+from sqlalchemy import and_, bindparam, delete, func, insert, or_, select, union_all, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from ..models.orders import Order, ArchivedOrder, OrderStats
+from ..utils import db
+
+
+DIMENSIONS = ('day', 'order_status', 'size', 'color', 'design', 'material')
+
+
+def _name(value):
+    return value.name if isinstance(value, Enum) else value
+
+
+# what an order not yet flushed will get from the column defaults
+DEFAULTS = {
+    field: Order.__table__.c[field].default.arg.name
+    for field in ('order_status', 'size', 'color', 'design', 'material')
+}
+
+
+def stats_key(order_status, size, color, design, material, date_created):
+    return (
+        date_created.date(),
+        _name(order_status) or DEFAULTS['order_status'],
+        _name(size) or DEFAULTS['size'],
+        _name(color) or DEFAULTS['color'],
+        _name(design) or DEFAULTS['design'],
+        _name(material) or DEFAULTS['material'],
+    )
+
+
+def order_key(order, **changes):
+    """
+        The summary row of an order, with changes applied on top of it
+    """
+    values = {field: getattr(order, field) for field in ('order_status', 'size', 'color', 'design', 'material', 'date_created')}
+    values.update(changes)
+    return stats_key(**values)
+
+
+class StatsDelta:
+    """
+        What one transaction changes in order_stats, applied before its commit
+    """
+
+    def __init__(self):
+        self.orders = Counter()
+        self.quantity = Counter()
+
+    def add(self, key, quantity):
+        self.orders[key] += 1
+        self.quantity[key] += quantity
+
+    def remove(self, key, quantity):
+        self.orders[key] -= 1
+        self.quantity[key] -= quantity
+
+    def move(self, old_key, old_quantity, new_key, new_quantity):
+        self.remove(old_key, old_quantity)
+        self.add(new_key, new_quantity)
+
+    def apply(self):
+        """
+            One INSERT ... ON CONFLICT DO UPDATE whatever the number of rows,
+            so two transactions creating the same row both add to it
+        """
+        changes = {
+            key: (self.orders[key], self.quantity[key])
+            for key in set(self.orders) | set(self.quantity)
+            if self.orders[key] or self.quantity[key]
+        }
+        if not changes:
+            return
+        # the same order in every transaction, so two of them can't deadlock on the rows
+        rows = [
+            dict(zip(DIMENSIONS, key), orders=orders, quantity=quantity)
+            for key, (orders, quantity) in sorted(changes.items())
+        ]
+        stmt = _upsert(db.session.get_bind(OrderStats).dialect.name)
+        if stmt is not None:
+            db.session.execute(stmt, rows)
+            return
+        # no upsert: find, update and insert, again if another transaction inserted meanwhile
+        try:
+            with db.session.begin_nested():
+                _update_or_insert(rows)
+        except IntegrityError:
+            with db.session.begin_nested():
+                _update_or_insert(rows)
+
+
+def _upsert(dialect):
+    """
+        The insert adding to the counts of the rows that exist, None when dialect has none
+    """
+    table = OrderStats.__table__
+    if dialect in ('sqlite', 'postgresql'):
+        stmt = (sqlite_insert if dialect == 'sqlite' else postgresql_insert)(table)
+        return stmt.on_conflict_do_update(
+            index_elements=list(DIMENSIONS),
+            set_={'orders': table.c.orders + stmt.excluded.orders,
+                  'quantity': table.c.quantity + stmt.excluded.quantity}
+        )
+    if dialect in ('mysql', 'mariadb'):
+        stmt = mysql_insert(table)
+        return stmt.on_duplicate_key_update(
+            orders=table.c.orders + stmt.inserted.orders,
+            quantity=table.c.quantity + stmt.inserted.quantity
+        )
+    return None
+
+
+def _update_or_insert(rows):
+    pk = [getattr(OrderStats, dim) for dim in DIMENSIONS]
+    keys = [tuple(row[dim] for dim in DIMENSIONS) for row in rows]
+    existing = set(db.session.execute(
+        select(*pk).where(or_(*(and_(*(col == value for col, value in zip(pk, key))) for key in keys)))
+    ).all())
+
+    updates = [
+        dict({'b_' + dim: row[dim] for dim in DIMENSIONS}, b_orders=row['orders'], b_quantity=row['quantity'])
+        for key, row in zip(keys, rows) if key in existing
+    ]
+    if updates:
+        # the table, not the class: the ORM would want plain primary key dicts
+        table = OrderStats.__table__
+        db.session.execute(
+            update(table)
+            .where(*(table.c[dim] == bindparam('b_' + dim) for dim in DIMENSIONS))
+            .values(orders=table.c.orders + bindparam('b_orders'),
+                    quantity=table.c.quantity + bindparam('b_quantity')),
+            updates
+        )
+    inserts = [row for key, row in zip(keys, rows) if key not in existing]
+    if inserts:
+        db.session.execute(insert(OrderStats), inserts)
+
+
+def summarize(group_by, date_from=None, date_to=None):
+    columns = [getattr(OrderStats, dim) for dim in group_by]
+    stmt = select(*columns, func.sum(OrderStats.orders), func.sum(OrderStats.quantity))
+    if date_from is not None:
+        stmt = stmt.where(OrderStats.day >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(OrderStats.day <= date_to)
+    stmt = stmt.group_by(*columns).order_by(*columns)
+    return [
+        dict(zip(group_by, (v.isoformat() if dim == 'day' else v for dim, v in zip(group_by, row[:-2]))),
+             orders=row[-2], quantity=row[-1])
+        for row in db.session.execute(stmt)
+        if row[-2]
+    ]
+
+
+def _from_orders():
+    """
+        order_stats as it should be, computed from orders and orders_archive
+    """
+    expected = {}
+    # archived orders still count
+    stmt = union_all(*(
+        select(model.order_status, model.size, model.color, model.design, model.material,
+               model.date_created, model.quantity)
+        for model in (Order, ArchivedOrder)
+    ))
+    for status, size, color, design, material, created, quantity in db.session.execute(stmt):
+        if created is None:
+            continue
+        key = stats_key(status, size, color, design, material, created)
+        orders_sum, quantity_sum = expected.get(key, (0, 0))
+        expected[key] = (orders_sum + 1, quantity_sum + (quantity or 0))
+    return expected
+
+
+def _from_table():
+    rows = db.session.execute(select(OrderStats)).scalars()
+    return {
+        tuple(getattr(row, dim) for dim in DIMENSIONS): (row.orders, row.quantity)
+        for row in rows if row.orders or row.quantity
+    }
+
+
+def drift():
+    """
+        The summary rows whose (orders, quantity) differ from the orders table
+    """
+    expected, actual = _from_orders(), _from_table()
+    return {
+        key: (actual.get(key, (0, 0)), expected.get(key, (0, 0)))
+        for key in set(expected) | set(actual)
+        if actual.get(key, (0, 0)) != expected.get(key, (0, 0))
+    }
+
+
+def rebuild():
+    expected = _from_orders()
+    db.session.execute(delete(OrderStats))
+    if expected:
+        db.session.execute(insert(OrderStats), [
+            dict(zip(DIMENSIONS, key), orders=orders, quantity=quantity)
+            for key, (orders, quantity) in expected.items()
+        ])
+    db.session.commit()
+    return len(expected)
+
+
+def register_commands(app):
+
+    @app.cli.command('rebuild-order-stats')
+    @click.option('--check', is_flag=True, help="only report the drift, change nothing")
+    def rebuild_order_stats(check):
+        """
+            Recompute the order_stats table from the orders
+        """
+        differences = drift()
+        for key, (actual, expected) in sorted(differences.items(), key=lambda item: str(item[0])):
+            click.echo(f"drift {key}: table {actual}, orders {expected}")
+        click.echo(f"{len(differences)} drifted rows")
+        if check:
+            raise SystemExit(1 if differences else 0)
+        click.echo(f"rebuilt {rebuild()} rows")
@@ -0,0 +1,119 @@
+#request payload checks, built once from the model enums, run before a view does any database work
+from werkzeug.exceptions import BadRequest
+from ..models.orders import Resource, OrderStatus, Sizes, Colors, PrintDesigns, Materials
+
+
+def one_of(names):
+    """
+        Check that a value is one of names
+    """
+    names = frozenset(names)
+
+    def check(field, value):
+        # a list or object is not hashable, the type test keeps it out of the set lookup
+        if type(value) is not str or value not in names:
+            return f"Invalid {field} : {value}"
+        return None
+    return check
+
+
+def member_of(enum):
+    return one_of(enum.__members__)
+
+
+def positive_int(field, value):
+    # bool is a subclass of int, type() keeps it out
+    if type(value) is not int or value < 1:
+        return f"{field} must be a positive integer"
+    return None
+
+
+def non_negative_int(field, value):
+    if type(value) is not int or value < 0:
+        return f"{field} must be a non negative integer"
+    return None
+
+
+def string(max_length):
+    def check(field, value):
+        if type(value) is not str or not value.strip() or len(value) > max_length:
+            return f"{field} must be a non empty string of at most {max_length} characters"
+        return None
+    return check
+
+
+def id_list(field, value):
+    if (type(value) is not list or not value
+            or not all(type(item) is int for item in value)):
+        return f"{field} must be a non empty list of order ids"
+    return None
+
+
+class Validator:
+    """
+        The checks of a JSON object payload, one (field, check) pair per
+        field, in the order they run. A check returns None for a good value
+        and the error message otherwise. Fields without a check are ignored,
+        as the flask-restx models let them through.
+    """
+
+    def __init__(self, name, checks):
+        self.name = name
+        self.checks = tuple(checks.items())
+
+    def error(self, payload):
+        """
+            The first error of payload, None when it is valid
+        """
+        if type(payload) is not dict:
+            return f"{self.name} must be an object"
+        get = payload.get
+        for field, check in self.checks:
+            error = check(field, get(field))
+            if error is not None:
+                return error
+        return None
+
+    def errors(self, payloads):
+        """
+            The error of every payload of a batch, None for the valid ones
+        """
+        error = self.error
+        return [error(payload) for payload in payloads]
+
+    def __call__(self, payload):
+        """
+            payload, or a 400 with the first error
+        """
+        error = self.error(payload)
+        if error is not None:
+            raise BadRequest(error)
+        return payload
+
+
+order = Validator('An order', {
+    'size': member_of(Sizes),
+    'color': member_of(Colors),
+    'design': member_of(PrintDesigns),
+    'material': member_of(Materials),
+    'quantity': positive_int,
+})
+
+order_status = Validator('A status change', {
+    'order_status': member_of(OrderStatus),
+})
+
+order_status_batch = Validator('A status change', {
+    'order_ids': id_list,
+    'order_status': member_of(OrderStatus),
+})
+
+# the stock an order takes, of its color and of its material
+RESOURCE_TYPES = ('COLOR', 'MATERIAL')
+
+resource = Validator('A resource', {
+    'type': one_of(RESOURCE_TYPES),
+    'name': string(Resource.__table__.c.name.type.length),
+    'quantity': non_negative_int,
+})
+
@@ -1,11 +1,18 @@
-from flask import session
-from flask_restx import Namespace, Resource, fields
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from ..models.orders import Order, Resource as ResourceModel
+from flask import current_app, request, Response, stream_with_context
+from flask_restx import Namespace, Resource, fields, marshal, reqparse, inputs
+from flask_jwt_extended import jwt_required
+from ..models.orders import Order, ArchivedOrder, OrderStatus, Resource as ResourceModel
 from ..models.users import User
+from ..auth.identity import current_user
 from http import HTTPStatus
-from ..utils.__init__ import db
-from datetime import datetime
+from werkzeug.exceptions import HTTPException, BadRequest, Conflict, NotFound
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from ..utils import db
+from . import archive, export, filters, inventory, reservations, serializers, shards, stats, validation
+from ..utils.pagination import pagination_parser, is_paginated, keyset_page
+from ..utils.etags import make_etag, not_modified
+from ..utils.idempotency import idempotent
 
 order_namespace = Namespace('orders', description="a name space for orders")
 
@@ -49,6 +56,49 @@ resource_model = order_namespace.model(
     }
 )
 
+batch_result_model = order_namespace.model(
+    'OrderBatchResult', {
+        'index': fields.Integer(description="The position of the order in the request"),
+        'created': fields.Boolean(description="Whether the order was created"),
+        'message': fields.String(description="Why the order was not created"),
+        'order': fields.Nested(order_model, allow_null=True, skip_none=True)
+    }
+)
+
+order_status_batch_model = order_namespace.model(
+    'OrderStatusBatch', {
+        'order_ids': fields.List(fields.Integer, required=True, description="The orders to move"),
+        'order_status' : fields.String(required=True, description = "The status to move them to",
+                                       enum = ['PENDING','IN_PROGRESS','SHIPPED','DELIVERED','CANCELED','RETURNED'])
+    }
+)
+
+order_list_model = order_namespace.model(
+    'OrderList', {
+        'orders': fields.List(fields.Nested(order_model))
+    }
+)
+
+order_batch_model = order_namespace.model(
+    'OrderBatch', {
+        'results': fields.List(fields.Nested(batch_result_model))
+    }
+)
+
+order_page_model = order_namespace.model(
+    'OrderPage', {
+        'orders': fields.List(fields.Nested(order_model)),
+        'next_cursor': fields.String(description="Pass as cursor to get the next page, null on the last page")
+    }
+)
+
+resource_page_model = order_namespace.model(
+    'ResourcePage', {
+        'resources': fields.List(fields.Nested(resource_model)),
+        'next_cursor': fields.String(description="Pass as cursor to get the next page, null on the last page")
+    }
+)
+
 
 
 
@@ -56,10 +106,12 @@ resource_model = order_namespace.model(
 @order_namespace.route('/')
 class OrderGetCreate(Resource):
 
-    @order_namespace.marshal_with(order_model)
+    @order_namespace.expect(filters.order_list_parser)
+    @order_namespace.response(HTTPStatus.OK, "The orders, paged when limit or cursor is given", order_page_model)
     #for documentation
     @order_namespace.doc(
-        description = "Retrieve all Orders"
+        description = "Retrieve all Orders, filtered and sorted by the query parameters. "
+                      "The archived ones only with archived=true"
     )
     @jwt_required()
     def get(self):
@@ -67,12 +119,21 @@ class OrderGetCreate(Resource):
             Get all the orders
         """
 
-        user = User.query.filter_by(userName=get_jwt_identity()).first()
-        if user.role == 'ADMIN':
-            orders = Order.query.all()
+        user = current_user()
+        args = filters.parse_args()
+        if args['archived']:
+            stmt, keys, descending = archive.orders(args, None if user.role == 'ADMIN' else user.id)
         else:
-            orders = Order.query.filter_by(user_id=user.id).all()
-        return orders, HTTPStatus.OK
+            stmt = serializers.order_select()
+            if user.role != 'ADMIN':
+                stmt = stmt.where(Order.user_id == user.id)
+            stmt, keys, descending = filters.apply(stmt, args)
+
+        if not is_paginated(args):
+            return serializers.serialize_orders(db.session.execute(filters.ordered(stmt, keys, descending))), HTTPStatus.OK
+
+        rows, next_cursor = keyset_page(stmt, keys, args, descending)
+        return {'orders': serializers.serialize_orders(rows), 'next_cursor': next_cursor}, HTTPStatus.OK
 
 
 
@@ -83,9 +144,10 @@ class OrderGetCreate(Resource):
 
 
     @order_namespace.expect(order_model)
-    @order_namespace.marshal_with(order_model)
+    @order_namespace.response(HTTPStatus.CREATED, "The order", order_model)
     @order_namespace.doc(
-        description = "Adding new orders"
+        description = "Adding new orders, retries with the same Idempotency-Key header get the first response back",
+        params = {'Idempotency-Key': {'in': 'header', 'description': "a unique key per order the client places"}}
     )
     @jwt_required()
     def post(self):
@@ -93,50 +155,157 @@ class OrderGetCreate(Resource):
             Create a new order
         """
 
-        userName = get_jwt_identity()
-        current_user = User.query.filter_by(userName= userName).first()
+        # bad payloads cost no query, not even the idempotency lookup
+        data = validation.order(order_namespace.payload)
 
-        data = order_namespace.payload
+        user = current_user()
 
+        def create(record):
+            # reserves the stock and inserts the order in one transaction, with its stored response
+            new_order = reservations.create_order(
+                user.id, data,
+                before_commit = record and (lambda order: record(marshal(order, order_model), HTTPStatus.CREATED))
+            )
+            return marshal(new_order, order_model), HTTPStatus.CREATED
 
-        # Check if order is feasible
-        color_resource = ResourceModel.query.filter_by(type='COLOR', name=data['color']).first()
-        material_resource = ResourceModel.query.filter_by(type='MATERIAL', name=data['material']).first()
+        return idempotent(user.id, data, create)
+    
 
-        if not color_resource or not material_resource or color_resource.quantity < data['quantity'] or material_resource.quantity < data['quantity']:
-            return {"message": "Order not feasible due to resource constraints"}, HTTPStatus.BAD_REQUEST
-        
 
-        new_order = Order(
-            size = data['size'],
-            quantity = data['quantity'],
-            color = data['color'],
-            design = data['design'],
-            material = data['material'],
-            user_id=current_user.id
+
+
+
+
+export_parser = reqparse.RequestParser()
+export_parser.add_argument('format', choices=('ndjson', 'csv'), default='ndjson', location='args')
+export_parser.add_argument('status', choices=[status.name for status in OrderStatus], location='args')
+export_parser.add_argument('created_from', type=inputs.datetime_from_iso8601, location='args',
+                           help="only orders created at or after this ISO 8601 date")
+export_parser.add_argument('created_to', type=inputs.datetime_from_iso8601, location='args',
+                           help="only orders created before this ISO 8601 date")
+
+
+@order_namespace.route('/export')
+class OrderExport(Resource):
+
+    @order_namespace.expect(export_parser)
+    @order_namespace.doc(
+        description = "Stream every order as NDJSON or CSV, the archived ones included"
+    )
+    @jwt_required()
+    def get(self):
+        """
+            Export the orders
+        """
+
+        user = current_user()
+        if user.role != 'ADMIN':
+            return {"message": "Only admins can export orders"}, HTTPStatus.FORBIDDEN
+
+        args = export_parser.parse_args()
+        stmt = export.export_query(
+            status = args['status'],
+            created_from = args['created_from'],
+            created_to = args['created_to']
         )
 
-        # Update resources
-        color_resource.quantity -= data['quantity']
-        material_resource.quantity -= data['quantity']
+        if args['format'] == 'csv':
+            lines, mimetype = export.csv_lines(stmt), 'text/csv'
+        else:
+            lines, mimetype = export.ndjson_lines(stmt), 'application/x-ndjson'
+
+        response = Response(stream_with_context(lines), mimetype=mimetype)
+        response.headers['Content-Disposition'] = f"attachment; filename=orders.{args['format']}"
+        return response
+
 
-        #new_order.user = current_user.id #hna kot dayra .id
-        #new_order.save()
-        new_order.save()
-        db.session.commit()
 
-        return new_order , HTTPStatus.CREATED
-    
 
+def group_by_dimensions(value):
+    dimensions = [dim.strip() for dim in value.split(',') if dim.strip()]
+    unknown = [dim for dim in dimensions if dim not in stats.DIMENSIONS]
+    if not dimensions or unknown:
+        raise ValueError(f"unknown dimension {', '.join(unknown) or value!r}")
+    return list(dict.fromkeys(dimensions))
 
 
+stats_parser = reqparse.RequestParser()
+stats_parser.add_argument('group_by', type=group_by_dimensions, default=['day', 'order_status'], location='args',
+                          help="comma separated: " + ', '.join(stats.DIMENSIONS))
+stats_parser.add_argument('date_from', type=inputs.date, location='args',
+                          help="first day to include, YYYY-MM-DD")
+stats_parser.add_argument('date_to', type=inputs.date, location='args',
+                          help="last day to include, YYYY-MM-DD")
+
+
+@order_namespace.route('/stats')
+class OrderStatsSummary(Resource):
+
+    @order_namespace.expect(stats_parser)
+    @order_namespace.doc(
+        description = "Order counts and hoodie quantities grouped by day, status, size, color, design or material"
+    )
+    @jwt_required()
+    def get(self):
+        """
+            Summarize the orders
+        """
+
+        user = current_user()
+        if user.role != 'ADMIN':
+            return {"message": "Only admins can view order stats"}, HTTPStatus.FORBIDDEN
+
+        args = stats_parser.parse_args()
+        date_from = args['date_from'].date() if args['date_from'] else None
+        date_to = args['date_to'].date() if args['date_to'] else None
+        return {'stats': stats.summarize(args['group_by'], date_from, date_to)}, HTTPStatus.OK
+
+
+@order_namespace.route('/batch')
+class OrderBatchCreate(Resource):
+
+    @order_namespace.expect([order_model])
+    @order_namespace.doc(
+        description = "Adding a cart of orders, either all of them are created or none. "
+                      "Retries with the same Idempotency-Key header get the first response back",
+        params = {'Idempotency-Key': {'in': 'header', 'description': "a unique key per cart the client places"}}
+    )
+    @jwt_required()
+    def post(self):
+        """
+            Create several orders at once
+        """
+
+        items = order_namespace.payload
+        if not isinstance(items, list) or not items:
+            raise BadRequest("Expected a non empty list of orders")
+        if len(items) > current_app.config['BATCH_MAX_SIZE']:
+            raise BadRequest(f"A batch holds at most {current_app.config['BATCH_MAX_SIZE']} orders")
+        reservations.check_orders(items)
+
+        user = current_user()
+
+        def respond(orders):
+            results = [{'index': i, 'created': True, 'order': order} for i, order in enumerate(orders)]
+            return marshal({'results': results}, order_batch_model)
+
+        def create(record):
+            orders = reservations.create_orders(
+                user.id, items,
+                before_commit = record and (lambda orders: record(respond(orders), HTTPStatus.CREATED))
+            )
+            return respond(orders), HTTPStatus.CREATED
+
+        return idempotent(user.id, items, create)
+
 
 
 
 @order_namespace.route('/<int:order_id>')
 class GetUpdateDelete(Resource):
     
-    @order_namespace.marshal_with(order_model)
+    @order_namespace.response(HTTPStatus.OK, "The order", order_model)
+    @order_namespace.response(HTTPStatus.NOT_MODIFIED, "The order did not change since the If-None-Match ETag")
     @order_namespace.doc(
         description = "Retrieve an Order by ID",
         parameters = {
@@ -149,11 +318,28 @@ class GetUpdateDelete(Resource):
             Retriev an order by its id
         """
 
-        user = User.query.filter_by(userName=get_jwt_identity()).first()
+        user = current_user()
+        # owner and version first, the order itself only when the client lacks it
+        stamp = db.session.execute(
+            select(Order.user_id, Order.date_updated).where(Order.id == order_id)
+        ).first()
+        if stamp is None:
+            # it may have been archived
+            stamp = db.session.execute(
+                select(ArchivedOrder.user_id, ArchivedOrder.date_updated).where(ArchivedOrder.id == order_id)
+            ).first()
+        if stamp is None:
+            raise NotFound()
+        if user.role != 'ADMIN' and stamp.user_id != user.id:
+            return {"message": "You are not authorized to view this order"}, HTTPStatus.FORBIDDEN
+
+        etag = make_etag('order', order_id, stamp.date_updated)
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+
         order = Order.get_by_id(order_id)
-        if user.role == 'ADMIN' or order.user_id == user.id:
-            return order, HTTPStatus.OK
-        return {"message": "You are not authorized to view this order"}, HTTPStatus.FORBIDDEN
+        return marshal(order, order_model), HTTPStatus.OK, {'ETag': etag}
         #order = Order.get_by_id(order_id)
         #return order, HTTPStatus.OK
     
@@ -170,9 +356,12 @@ class GetUpdateDelete(Resource):
             Update the order with id
         """
 
+        data = validation.order(order_namespace.payload)
+
         try:
-            user = User.query.filter_by(userName=get_jwt_identity()).first()
-            order_to_update = Order.get_by_id(order_id)
+            user = current_user()
+            # archived orders are read only
+            order_to_update = Order.get_by_id(order_id, archived=False)
 
             if not order_to_update:
                 return {"message": "Order not found"}, HTTPStatus.NOT_FOUND
@@ -180,54 +369,23 @@ class GetUpdateDelete(Resource):
             if user.role != 'ADMIN' and order_to_update.user_id != user.id:
                 return {"message": "You are not authorized to update this order"}, HTTPStatus.FORBIDDEN
             
-            if order_to_update.order_status != 'PENDING':
+            if order_to_update.order_status != OrderStatus.PENDING:
                 return {"message": "Only pending orders can be modified"}, HTTPStatus.BAD_REQUEST
 
-            data = order_namespace.payload
-
-            # Check if order is feasible
-            color_resource = ResourceModel.query.filter_by(type='COLOR', name=data['color']).first()
-            material_resource = ResourceModel.query.filter_by(type='MATERIAL', name=data['material']).first()
-
-            if not color_resource or not material_resource:
-                return {"message": "Invalid color or material"}, HTTPStatus.BAD_REQUEST
-
-            quantity_diff = data['quantity'] - order_to_update.quantity
-            if color_resource.quantity < quantity_diff or material_resource.quantity < quantity_diff:
-                return {"message": "Order update not feasible due to resource constraints"}, HTTPStatus.BAD_REQUEST
-            
-            # Update resources
-            color_resource.quantity -= quantity_diff
-            material_resource.quantity -= quantity_diff
-
-            # Update order
-            order_to_update.quantity = data['quantity']
-            order_to_update.size = data['size']
-            order_to_update.color = data['color']
-            order_to_update.design = data['design']
-            order_to_update.material = data['material']
-            order_to_update.date_updated = datetime.utcnow()
-
-            db.session.commit()
+            # gives back the old stock and reserves the new one in one transaction
+            reservations.update_order(order_to_update, data)
 
             # Create response
             response = {
                 "message": "Order updated successfully",
-                "order": {
-                    "id": order_to_update.id,
-                    "quantity": order_to_update.quantity,
-                    "size": order_to_update.size,
-                    "order_status": order_to_update.order_status,
-                    "color": order_to_update.color,
-                    "design": order_to_update.design,
-                    "material": order_to_update.material,
-                    "date_created": str(order_to_update.date_created),
-                    "date_updated": str(order_to_update.date_updated)
-                }
+                "order": marshal(order_to_update, order_model)
             }
 
             return response, HTTPStatus.OK
 
+        except HTTPException:
+            raise
+
         except Exception as e:
             db.session.rollback()
             return {"message": f"Error updating order: {str(e)}"}, HTTPStatus.INTERNAL_SERVER_ERROR
@@ -243,8 +401,8 @@ class GetUpdateDelete(Resource):
             Delete an order with id
         """
 
-        user = User.query.filter_by(userName=get_jwt_identity()).first()
-        order_to_delete = session.query(Order).get(order_id)
+        user = current_user()
+        order_to_delete = Order.get_by_id(order_id, archived=False)
 
         if user.role != 'ADMIN' and order_to_delete.user_id != user.id:
             return {"message": "You are not authorized to delete this order"}, HTTPStatus.FORBIDDEN
@@ -252,17 +410,10 @@ class GetUpdateDelete(Resource):
         #if order_to_delete.order_status != 'PENDING':
          #   return {"message": "Only pending orders can be deleted"}, HTTPStatus.BAD_REQUEST
 
-        # Restore resources
-        #color_resource = ResourceModel.query.filter_by(type='COLOR', name=order_to_delete.color).first()
-        #material_resource = ResourceModel.query.filter_by(type='MATERIAL', name=order_to_delete.material).first()
+        # gives back the stock the order still holds in the same transaction
+        reservations.delete_order(order_to_delete)
 
-        #color_resource.quantity += order_to_delete.quantity
-        #material_resource.quantity += order_to_delete.quantity
-
-        order_to_delete.delete()
-        db.session.commit()
-
-        return order_to_delete, HTTPStatus.NO_CONTENT
+        return None, HTTPStatus.NO_CONTENT
 
 
 
@@ -280,11 +431,13 @@ class GetOrderById(Resource):
             Get user's order
         """
 
-        current_user = User.query.filter_by(userName=get_jwt_identity()).first()
-        if current_user.role != 'ADMIN' and current_user.id != user_id:
+        user = current_user()
+        if user.role != 'ADMIN' and user.id != user_id:
             return {"message": "You are not authorized to view this order"}, HTTPStatus.FORBIDDEN
 
         order = Order.query.filter_by(id=order_id, user_id=user_id).first()
+        if not order:
+            order = ArchivedOrder.query.filter_by(id=order_id, user_id=user_id).first()
         if not order:
             return {"message": "Order not found"}, HTTPStatus.NOT_FOUND
 
@@ -295,7 +448,9 @@ class GetOrderById(Resource):
 @order_namespace.route('/user/<int:user_id>/orders')
 class UserOrders(Resource):
 
-    @order_namespace.marshal_with(order_model)
+    @order_namespace.expect(filters.order_list_parser)
+    @order_namespace.response(HTTPStatus.OK, "The user's orders, paged when limit or cursor is given", order_page_model)
+    @order_namespace.response(HTTPStatus.NOT_MODIFIED, "The orders did not change since the If-None-Match ETag")
     @order_namespace.doc(
         description = "Get the orders of a user given his ID"
     )
@@ -305,16 +460,57 @@ class UserOrders(Resource):
             Get all orders of the user X
         """
 
-        current_user = User.query.filter_by(userName=get_jwt_identity()).first()
-        if current_user.role != 'ADMIN' and current_user.id != user_id:
+        caller = current_user()
+        if caller.role != 'ADMIN' and caller.id != user_id:
             return {"message": "You are not authorized to view these orders"}, HTTPStatus.FORBIDDEN
 
+        args = filters.parse_args()
+
+        # any insert, update or delete among the user's orders moves the stamp
+        stamp = archive.user_stamp(user_id)
+        etag = make_etag('user-orders', user_id, stamp, tuple(sorted(request.args.items(multi=True))))
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+
         user = User.get_by_id(user_id)
-        orders = user.order
+        # the archived orders too, they are few per user
+        stmt, keys, descending = archive.user_orders(user.id, args)
 
-        return orders, HTTPStatus.OK
+        if not is_paginated(args):
+            rows = db.session.execute(filters.ordered(stmt, keys, descending))
+            return serializers.serialize_orders(rows), HTTPStatus.OK, {'ETag': etag}
+
+        rows, next_cursor = keyset_page(stmt, keys, args, descending)
+        return {'orders': serializers.serialize_orders(rows), 'next_cursor': next_cursor}, HTTPStatus.OK, {'ETag': etag}
         
 
+@order_namespace.route('/status')
+class UpdateOrderStatuses(Resource):
+
+    @order_namespace.expect(order_status_batch_model)
+    @order_namespace.response(HTTPStatus.OK, "The orders after the change", order_list_model)
+    @order_namespace.doc(
+        description = "Move several orders to a status at once, either all of them move or none"
+    )
+    @jwt_required()
+    def patch(self):
+        """
+            Update the status of several orders
+        """
+        data = validation.order_status_batch(order_namespace.payload)
+        if len(data['order_ids']) > current_app.config['STATUS_BATCH_MAX_SIZE']:
+            raise BadRequest(f"At most {current_app.config['STATUS_BATCH_MAX_SIZE']} orders can change status at once")
+
+        user = current_user()
+        if user.role != 'ADMIN':
+            return {"message": "Only admins can update order status"}, HTTPStatus.FORBIDDEN
+
+        # one UPDATE for all of them, canceled and returned orders give their stock back
+        orders = reservations.change_statuses(data['order_ids'], data['order_status'])
+        return {'orders': orders}, HTTPStatus.OK
+
+
 @order_namespace.route('/status/<int:order_id>')
 class UpdateOrderStatus(Resource):
 
@@ -328,37 +524,69 @@ class UpdateOrderStatus(Resource):
         """
             Update an order's status 
         """
-        current_user = User.query.filter_by(userName=get_jwt_identity()).first()
-        if current_user.role != 'ADMIN':
-            return {"message": "Only admins can update order status"}, HTTPStatus.FORBIDDEN
+        data = validation.order_status(order_namespace.payload)
 
-        data = order_namespace.payload
+        user = current_user()
+        if user.role != 'ADMIN':
+            return {"message": "Only admins can update order status"}, HTTPStatus.FORBIDDEN
 
-        order_to_update = Order.get_by_id(order_id)
-        order_to_update.order_status = data['order_status']
-        order_to_update.date_updated = datetime.utcnow()
-
-        db.session.commit()
+        order_to_update = Order.get_by_id(order_id, archived=False)
+        # checked against the status transitions, stock and order stats follow in the same transaction
+        reservations.change_status(order_to_update, data['order_status'])
 
         return order_to_update, HTTPStatus.OK
     
 
 
+def save_resource(resource):
+    """
+        Commit the resource and its stock, hand the row to the inventory cache and return it
+    """
+    # read before the rollback expires them
+    type, name = resource.type, resource.name
+    try:
+        shards.set_stock(resource)
+        db.session.commit()
+    except IntegrityError:
+        # (type, name) is unique
+        db.session.rollback()
+        raise Conflict(f"A resource of type {type} named {name} already exists")
+    row = db.session.execute(shards.stock_select().where(ResourceModel.id == resource.id)).one()
+    inventory.write_through([row])
+    return row
+
+
 @order_namespace.route('/resources')
 class ResourceManagement(Resource):
-    @order_namespace.marshal_list_with(resource_model)
+    @order_namespace.expect(pagination_parser)
+    @order_namespace.response(HTTPStatus.OK, "The resources, paged when limit or cursor is given", resource_page_model)
+    @order_namespace.response(HTTPStatus.NOT_MODIFIED, "The resources did not change since the If-None-Match ETag")
     @order_namespace.doc(description="Get all resources")
     @jwt_required()
     def get(self):
         """
             Get all resources
         """
-        current_user = User.query.filter_by(userName=get_jwt_identity()).first()
-        if current_user.role != 'ADMIN':
+        user = current_user()
+        if user.role != 'ADMIN':
             return {"message": "Only admins can view resources"}, HTTPStatus.FORBIDDEN
 
-        resources = ResourceModel.query.all()
-        return resources, HTTPStatus.OK
+        args = pagination_parser.parse_args()
+
+        # every resource write bumps its version, see inventory.table_stamp
+        etag = make_etag('resources', inventory.table_stamp(), args.get('limit'), args.get('cursor'))
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+
+        stmt = serializers.resource_select()
+
+        if not is_paginated(args):
+            return serializers.serialize_resources(db.session.execute(stmt)), HTTPStatus.OK, {'ETag': etag}
+
+        # resources have no creation date, the id alone orders them
+        rows, next_cursor = keyset_page(stmt, (ResourceModel.id,), args)
+        return {'resources': serializers.serialize_resources(rows), 'next_cursor': next_cursor}, HTTPStatus.OK, {'ETag': etag}
 
     @order_namespace.expect(resource_model)
     @order_namespace.marshal_with(resource_model)
@@ -368,11 +596,11 @@ class ResourceManagement(Resource):
         """
             Add a new resource
         """
-        current_user = User.query.filter_by(userName=get_jwt_identity()).first()
-        if current_user.role != 'ADMIN':
-            return {"message": "Only admins can add resources"}, HTTPStatus.FORBIDDEN
+        data = validation.resource(order_namespace.payload)
 
-        data = order_namespace.payload
+        user = current_user()
+        if user.role != 'ADMIN':
+            return {"message": "Only admins can add resources"}, HTTPStatus.FORBIDDEN
 
         new_resource = ResourceModel(
             type=data['type'],
@@ -380,9 +608,10 @@ class ResourceManagement(Resource):
             quantity=data['quantity']
         )
 
-        new_resource.save()
+        db.session.add(new_resource)
+        row = save_resource(new_resource)
 
-        return new_resource, HTTPStatus.CREATED
+        return row._asdict(), HTTPStatus.CREATED
 
 @order_namespace.route('/resources/<int:resource_id>')
 class ResourceUpdate(Resource):
@@ -394,17 +623,16 @@ class ResourceUpdate(Resource):
         """
             Update a resource
         """
-        current_user = User.query.filter_by(userName=get_jwt_identity()).first()
-        if current_user.role != 'ADMIN':
-            return {"message": "Only admins can update resources"}, HTTPStatus.FORBIDDEN
+        data = validation.resource(order_namespace.payload)
 
-        data = order_namespace.payload
+        user = current_user()
+        if user.role != 'ADMIN':
+            return {"message": "Only admins can update resources"}, HTTPStatus.FORBIDDEN
 
         resource_to_update = ResourceModel.get_by_id(resource_id)
         resource_to_update.type = data['type']
         resource_to_update.name = data['name']
         resource_to_update.quantity = data['quantity']
+        row = save_resource(resource_to_update)
 
-        db.session.commit()
-
-        return resource_to_update, HTTPStatus.OK
\ No newline at end of file
+        return row._asdict(), HTTPStatus.OK
\ No newline at end of file
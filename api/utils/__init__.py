@@ -1,5 +1,7 @@
 #create the db instance
 from flask_sqlalchemy import SQLAlchemy 
 
-db = SQLAlchemy()
+from .replicas import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
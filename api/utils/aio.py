@@ -0,0 +1,176 @@
+#async serving: an ASGI app that runs every request of the Flask app on the event loop,
+#the database IO goes through an async driver and gives the loop to other requests
+import asyncio
+import io
+import sys
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.util import await_only, greenlet_spawn
+
+
+# the async driver of each backend, e.g. sqlite:///db.sqlite3 -> sqlite+aiosqlite:///db.sqlite3
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'mysql': 'mysql+aiomysql',
+}
+
+
+def async_url(url):
+    scheme, sep, rest = url.partition('://')
+    return ASYNC_DRIVERS.get(scheme.split('+')[0], scheme) + sep + rest
+
+
+def async_config(base):
+    """
+        base with every database URL moved to its async driver
+    """
+    options = dict(getattr(base, 'SQLALCHEMY_ENGINE_OPTIONS', None) or {})
+    url = base.SQLALCHEMY_DATABASE_URI
+    if url and url.startswith('sqlite:///') and 'poolclass' not in options:
+        # aiosqlite would open a connection, and a thread, per checkout
+        options['poolclass'] = AsyncAdaptedQueuePool
+
+    class AsyncConfig(base):
+        SQLALCHEMY_DATABASE_URI = async_url(url) if url else url
+        SQLALCHEMY_BINDS = {key: async_url(url) for key, url in (getattr(base, 'SQLALCHEMY_BINDS', None) or {}).items()}
+        SQLALCHEMY_ENGINE_OPTIONS = options
+    AsyncConfig.__name__ = f'Async{base.__name__}'
+    return AsyncConfig
+
+
+def wait(future):
+    """
+        The result of a concurrent future. In a request of AsyncApp the
+        event loop serves other requests meanwhile
+    """
+    if not _in_event_loop():
+        # outside the try, the errors of fn are not chained to a "no running event loop"
+        return future.result()
+    return await_only(asyncio.wrap_future(future))
+
+
+def _in_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def run_io(app, fn):
+    """
+        fn() from a thread of our own, e.g. the password hashing pool. With
+        AsyncApp the database is only reachable from the event loop, so fn
+        runs there
+    """
+    server = app.extensions.get('aio')
+    if server is None or server.loop is None:
+        return fn()
+    return asyncio.run_coroutine_threadsafe(greenlet_spawn(fn), server.loop).result()
+
+
+def _environ(scope, body):
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin-1'),
+        'PATH_INFO': scope['path'].encode().decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+        # the whole body is read already, whatever Content-Length says
+        'wsgi.input_terminated': True,
+    }
+    server = scope.get('server') or ('localhost', 80)
+    environ['SERVER_NAME'], environ['SERVER_PORT'] = server[0], str(server[1] or 80)
+    if scope.get('client'):
+        environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = scope['client'][0], str(scope['client'][1])
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f'HTTP_{name}'
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+class AsyncApp:
+    """
+        ASGI application serving a Flask app. Each request runs in a
+        greenlet on the event loop, SQLAlchemy's bridge to async drivers:
+        the views stay as they are, and while one waits on the database the
+        loop runs the others. The app needs async database URLs, see
+        async_config.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.loop = None
+        app.extensions['aio'] = self
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] == 'websocket':
+            return await self._reject_websocket(receive, send)
+        if scope['type'] != 'http':
+            # nothing else is served, the server just finishes the connection
+            return
+        self.loop = asyncio.get_running_loop()
+
+        body = bytearray()
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'], started['headers'] = status, headers
+
+        iterable = await greenlet_spawn(self.app, _environ(scope, bytes(body)), start_response)
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': int(started['status'].split(' ', 1)[0]),
+                'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                            for name, value in started['headers']],
+            })
+            # a streamed body may query the database for every chunk
+            chunks = iter(iterable)
+            while (chunk := await greenlet_spawn(next, chunks, None)) is not None:
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(iterable, 'close'):
+                await greenlet_spawn(iterable.close)
+
+    async def _reject_websocket(self, receive, send):
+        # the API has no websocket routes, closing before accepting turns the handshake down
+        message = await receive()
+        if message['type'] == 'websocket.connect':
+            await send({'type': 'websocket.close', 'code': 1000})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.loop = asyncio.get_running_loop()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await greenlet_spawn(self._dispose)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _dispose(self):
+        db = self.app.extensions['sqlalchemy']
+        with self.app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
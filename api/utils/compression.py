@@ -0,0 +1,84 @@
+#negotiated gzip (and brotli when installed) compression of responses, streamed ones included
+import zlib
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _gzip_stream(chunks, level):
+    # wbits 31 is the gzip container
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _brotli_stream(chunks, quality):
+    compressor = brotli.Compressor(quality=quality)
+    for chunk in chunks:
+        data = compressor.process(chunk.encode() if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def _gzip(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def encodings():
+    """
+        What this process can send, best first
+    """
+    if brotli is not None and current_app.config['COMPRESS_BROTLI']:
+        return ['br', 'gzip']
+    return ['gzip']
+
+
+def compress(response):
+    config = current_app.config
+    if (response.status_code < 200 or response.status_code in (204, 304)
+            or response.direct_passthrough or 'Content-Encoding' in response.headers
+            or response.mimetype not in config['COMPRESS_MIMETYPES']):
+        return response
+
+    # caches must keep the encodings apart, whatever this client asked for
+    response.vary.add('Accept-Encoding')
+    encoding = request.accept_encodings.best_match(encodings())
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        # the size is unknown up front, a stream is worth compressing anyway
+        if encoding == 'br':
+            response.response = _brotli_stream(response.response, config['COMPRESS_BROTLI_QUALITY'])
+        else:
+            response.response = _gzip_stream(response.response, config['COMPRESS_LEVEL'])
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < config['COMPRESS_MIN_SIZE']:
+            return response
+        if encoding == 'br':
+            response.set_data(brotli.compress(data, quality=config['COMPRESS_BROTLI_QUALITY']))
+        else:
+            response.set_data(_gzip(data, config['COMPRESS_LEVEL']))
+
+    response.headers['Content-Encoding'] = encoding
+    # the bytes differ per encoding, the representation does not: a weak
+    # ETag still matches If-None-Match, whatever encoding the client got
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    if app.config['COMPRESS_ENABLED']:
+        app.after_request(compress)
@@ -0,0 +1,20 @@
+#strong ETags computed from cheap queries, so unchanged polls end in a 304
+import hashlib
+from flask import Response, request
+from werkzeug.http import quote_etag
+
+
+def make_etag(*parts):
+    """
+        A quoted strong ETag for whatever the representation depends on
+    """
+    return quote_etag(hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest())
+
+
+def not_modified(etag):
+    """
+        The 304 to send when the client holds etag already, None otherwise
+    """
+    if request.if_none_match.contains_weak(etag.strip('"')):
+        return Response(status=304, headers={'ETag': etag})
+    return None
@@ -0,0 +1,168 @@
+#Idempotency-Key support for writes: the first response is stored with the write and replayed to retries
+import hashlib
+import json
+import click
+from datetime import datetime, timedelta
+from flask import current_app, has_app_context, request
+from sqlalchemy import delete, event, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from werkzeug.exceptions import BadRequest, UnprocessableEntity
+from ..models.idempotency import IdempotencyKey
+from . import db
+from .cache import TTLCache
+
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyStore:
+    """
+        Stored responses by (user id, key). The database is the source of
+        truth, recent responses are also kept in a per process cache so
+        most retries are answered without a query.
+    """
+
+    def __init__(self, ttl, cache_size):
+        self.ttl = ttl
+        self.cache = TTLCache(maxsize=cache_size, ttl=ttl)
+
+    def lookup(self, user_id, key, fingerprint):
+        """
+            The stored (body, status) for the key, None when there is none
+        """
+        now = datetime.utcnow()
+        entry = self.cache.get((user_id, key))
+        if entry is None:
+            row = db.session.execute(
+                select(IdempotencyKey.fingerprint, IdempotencyKey.status_code,
+                       IdempotencyKey.response, IdempotencyKey.expires_at)
+                .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+            ).first()
+            if row is None:
+                return None
+            if row.expires_at <= now:
+                # not purged yet, it must not block the key being used again
+                db.session.execute(
+                    delete(IdempotencyKey)
+                    .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+                    .execution_options(synchronize_session=False)
+                )
+                return None
+            entry = (row.fingerprint, json.loads(row.response), row.status_code, row.expires_at)
+            self.cache.set((user_id, key), entry)
+
+        stored_fingerprint, body, status, expires_at = entry
+        if expires_at <= now:
+            self.cache.pop((user_id, key))
+            return None
+        if stored_fingerprint != fingerprint:
+            raise UnprocessableEntity(f"This {HEADER} was already used for a different request")
+        return body, status
+
+    def record(self, user_id, key, fingerprint, body, status):
+        """
+            Store the response in the current transaction, the cache gets it once that commits
+        """
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl)
+        db.session.execute(insert(IdempotencyKey).values(
+            user_id=user_id, key=key, fingerprint=fingerprint, status_code=int(status),
+            response=json.dumps(body), date_created=now, expires_at=expires_at
+        ))
+        db.session.info.setdefault('idempotency_records', []).append(
+            ((user_id, key), (fingerprint, body, int(status), expires_at)))
+
+    def purge(self, batch_size):
+        """
+            Delete the expired keys batch_size rows per statement, return how many went
+        """
+        now = datetime.utcnow()
+        purged = 0
+        while True:
+            expired = select(IdempotencyKey.id).where(IdempotencyKey.expires_at <= now).limit(batch_size)
+            deleted = db.session.execute(
+                delete(IdempotencyKey)
+                .where(IdempotencyKey.id.in_(expired))
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.session.commit()
+            purged += deleted
+            if deleted < batch_size:
+                return purged
+
+
+def init_app(app):
+    app.extensions['idempotency'] = IdempotencyStore(
+        ttl=app.config['IDEMPOTENCY_TTL'],
+        cache_size=app.config['IDEMPOTENCY_CACHE_SIZE']
+    )
+
+
+def register_commands(app):
+
+    @app.cli.command('purge-idempotency-keys')
+    def purge_idempotency_keys():
+        """
+            Delete the expired idempotency keys
+        """
+        purged = app.extensions['idempotency'].purge(app.config['IDEMPOTENCY_PURGE_BATCH'])
+        click.echo(f"purged {purged} expired idempotency keys")
+
+
+def get_store():
+    return current_app.extensions['idempotency']
+
+
+def fingerprint(payload):
+    raw = json.dumps([request.method, request.path, payload], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def idempotent(user_id, payload, write):
+    """
+        Run write(record) at most once per Idempotency-Key of the user and
+        return its (body, status). write must call record(body, status) inside
+        its transaction, before the commit, so the write and its stored
+        response commit or roll back together. Requests without the header
+        just run write(None).
+    """
+    key = request.headers.get(HEADER)
+    if key is None:
+        return write(None)
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise BadRequest(f"{HEADER} must be 1 to {MAX_KEY_LENGTH} characters")
+
+    store = get_store()
+    digest = fingerprint(payload)
+    replay = store.lookup(user_id, key, digest)
+    if replay is not None:
+        return replay + ({'Idempotent-Replayed': 'true'},)
+
+    def record(body, status):
+        store.record(user_id, key, digest, body, status)
+
+    try:
+        return write(record)
+    except IntegrityError:
+        # a concurrent request with the same key committed first, answer with its response
+        db.session.rollback()
+        replay = store.lookup(user_id, key, digest)
+        if replay is None:
+            raise
+        return replay + ({'Idempotent-Replayed': 'true'},)
+
+
+@event.listens_for(Session, 'after_commit')
+def _cache_recorded_responses(session):
+    records = session.info.pop('idempotency_records', None)
+    if records and has_app_context() and 'idempotency' in current_app.extensions:
+        cache = current_app.extensions['idempotency'].cache
+        for cache_key, entry in records:
+            cache.set(cache_key, entry)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_recorded_responses(session):
+    session.info.pop('idempotency_records', None)
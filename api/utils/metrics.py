@@ -0,0 +1,147 @@
+#request and database timings, exposed in the Prometheus text format at /metrics
+import hmac
+import os
+import time
+from bisect import bisect_left
+from threading import Lock
+from flask import Response, g, has_request_context, request
+from werkzeug.exceptions import Unauthorized
+from sqlalchemy import event
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # one slot per bucket, the last one is +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class Metrics:
+
+    def __init__(self):
+        self._lock = Lock()
+        self._latency = {}
+        self._statements = {}
+        self._db_time = {}
+        self._requests = {}
+
+    def record(self, route, method, status, seconds, statements, db_seconds):
+        key = (route, method)
+        with self._lock:
+            latency = self._latency.get(key)
+            if latency is None:
+                latency = self._latency[key] = Histogram(LATENCY_BUCKETS)
+                self._statements[key] = Histogram(STATEMENT_BUCKETS)
+                self._db_time[key] = Histogram(LATENCY_BUCKETS)
+            latency.observe(seconds)
+            self._statements[key].observe(statements)
+            self._db_time[key].observe(db_seconds)
+            counter = (route, method, status)
+            self._requests[counter] = self._requests.get(counter, 0) + 1
+
+    def render(self, extra=()):
+        # every worker of a pre-forking server keeps its own series, the pid tells them apart.
+        # sum without (pid) adds them up, a restarted worker is a counter reset of a new series
+        pid = f'pid="{os.getpid()}"'
+        lines = []
+        with self._lock:
+            for name, help, histograms in (
+                ('http_request_duration_seconds', "Time spent handling a request", self._latency),
+                ('http_request_db_statements', "SQL statements sent per request", self._statements),
+                ('http_request_db_duration_seconds', "Time spent in the database per request", self._db_time),
+            ):
+                lines.append(f'# HELP {name} {help}')
+                lines.append(f'# TYPE {name} histogram')
+                for (route, method), histogram in histograms.items():
+                    lines.extend(histogram.lines(name, f'{pid},route="{route}",method="{method}"'))
+
+            lines.append('# HELP http_requests_total Requests handled')
+            lines.append('# TYPE http_requests_total counter')
+            for (route, method, status), count in self._requests.items():
+                lines.append(f'http_requests_total{{{pid},route="{route}",method="{method}",status="{status}"}} {count}')
+
+        for name, kind, help, value in extra:
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.append(f'{name}{{{pid}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g._metrics_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'metrics_statements' in g:
+        g.metrics_db_seconds += time.perf_counter() - g.pop('_metrics_query_start', time.perf_counter())
+        g.metrics_statements += 1
+
+
+def init_app(app, db):
+    if not app.config['METRICS_ENABLED']:
+        return
+
+    metrics = app.extensions['metrics'] = Metrics()
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_statements = 0
+        g.metrics_db_seconds = 0.0
+
+    @app.after_request
+    def record_request(response):
+        if 'metrics_start' in g:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            metrics.record(route, request.method, response.status_code,
+                           time.perf_counter() - g.metrics_start,
+                           g.metrics_statements, g.metrics_db_seconds)
+        return response
+
+    # bytes, compare_digest refuses a str with non ASCII characters
+    token = app.config['METRICS_TOKEN'].encode()
+
+    def metrics_view():
+        if token and not hmac.compare_digest(request.headers.get('Authorization', '').encode(), b'Bearer ' + token):
+            raise Unauthorized("A valid metrics token is required")
+        extra = []
+        inventory = app.extensions.get('inventory')
+        if inventory is not None:
+            stats = inventory.stats()
+            extra.append(('inventory_cache_hits_total', 'counter', "Availability reads served by the mirror", stats['hits']))
+            extra.append(('inventory_cache_misses_total', 'counter', "Availability reads that reloaded the mirror", stats['misses']))
+        replicas = app.extensions.get('replicas')
+        if replicas is not None:
+            extra.append(('db_replica_reads_total', 'counter', "Reads sent to a replica", replicas.replica_reads))
+            extra.append(('db_primary_reads_total', 'counter', "Reads kept on the primary", replicas.primary_reads))
+        return Response(metrics.render(extra), mimetype='text/plain; version=0.0.4')
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,80 @@
+#keyset (cursor) pagination for the list endpoints
+import base64
+import json
+from datetime import datetime
+from flask import current_app
+from flask_restx import reqparse
+from sqlalchemy import and_, or_, DateTime
+from werkzeug.exceptions import BadRequest
+from . import db
+
+
+pagination_parser = reqparse.RequestParser()
+pagination_parser.add_argument('limit', type=int, location='args',
+                               help="the maximum number of items to return")
+pagination_parser.add_argument('cursor', type=str, location='args',
+                               help="the next_cursor value of the previous page")
+
+
+def is_paginated(args):
+    """
+        Clients that send neither limit nor cursor get the whole list
+    """
+    return args.get('limit') is not None or args.get('cursor') is not None
+
+
+def page_size(limit):
+    max_size = current_app.config['PAGE_SIZE_MAX']
+    if limit is None:
+        return min(current_app.config['PAGE_SIZE_DEFAULT'], max_size)
+    if limit < 1:
+        raise BadRequest("limit must be a positive integer")
+    return min(limit, max_size)
+
+
+def encode_cursor(values):
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, keys):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError(cursor)
+        return [datetime.fromisoformat(v) if isinstance(key.type, DateTime) else v
+                for key, v in zip(keys, values)]
+    except (ValueError, TypeError):
+        raise BadRequest("Invalid cursor")
+
+
+def after(keys, values, descending=False):
+    """
+        (k1, k2, ...) > (v1, v2, ...) spelled out so it works on every backend,
+        < when the keys are sorted in descending order
+    """
+    key, value = keys[0], values[0]
+    beyond = key < value if descending else key > value
+    if len(keys) == 1:
+        return beyond
+    return or_(beyond, and_(key == value, after(keys[1:], values[1:], descending)))
+
+
+def keyset_page(stmt, keys, args, descending=False):
+    """
+        Return one page of the rows of stmt ordered by keys and the cursor of the next one
+    """
+    limit = page_size(args.get('limit'))
+    if args.get('cursor'):
+        stmt = stmt.where(after(keys, decode_cursor(args['cursor'], keys), descending))
+
+    order = [key.desc() for key in keys] if descending else keys
+    rows = db.session.execute(stmt.order_by(*order).limit(limit + 1)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, key.key) for key in keys])
+
+    return rows, next_cursor
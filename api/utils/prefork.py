@@ -0,0 +1,20 @@
+#pre-forking servers build the app once and fork the workers, nothing connected may cross the fork
+import os
+import weakref
+
+
+def init_app(app, db):
+    app_ref = weakref.ref(app)
+
+    def after_fork():
+        app = app_ref()
+        if app is None:
+            return
+        with app.app_context():
+            for engine in db.engines.values():
+                # drop the inherited pool without closing the parent's connections
+                engine.dispose(close=False)
+
+    # not on Windows, which has no fork
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=after_fork)
@@ -0,0 +1,173 @@
+#read replica routing: SELECTs of GET requests go to a replica bind, everything else to the primary
+import os
+import random
+import sqlite3
+import time
+from threading import Lock
+import click
+from flask import current_app, g, has_request_context, request
+from flask_jwt_extended import get_jwt
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql import Select
+from .cache import TTLCache
+
+
+#SQLALCHEMY_BINDS keys of the replicas, see replica_binds in the config
+REPLICA_PREFIX = 'replica'
+READ_METHODS = ('GET', 'HEAD')
+#when the client last wrote, its reads stay on the primary for a while
+LAST_WRITE_COOKIE = 'last_write'
+
+
+class ReplicaRouter:
+    """
+        Picks the engine of every read. A request reads from one replica
+        from start to end. Clients that wrote in the last sticky_seconds,
+        by cookie or by user id, read from the primary, so do requests that
+        wrote themselves.
+    """
+
+    def __init__(self, keys, namespaces, sticky_seconds):
+        self.keys = keys
+        self.namespaces = tuple(f'{namespace}_' for namespace in namespaces)
+        self.sticky_seconds = sticky_seconds
+        self.recent_writers = TTLCache(maxsize=10000, ttl=sticky_seconds)
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self._lock = Lock()
+
+    def routed(self):
+        """
+            Whether the current request is a read of the routed namespaces
+        """
+        return (request.method in READ_METHODS and request.endpoint is not None
+                and request.endpoint.startswith(self.namespaces))
+
+    def wrote_recently(self):
+        last_write = request.cookies.get(LAST_WRITE_COOKIE)
+        try:
+            if last_write is not None and time.time() - float(last_write) < self.sticky_seconds:
+                return True
+        except ValueError:
+            pass
+        user_id = _user_id()
+        return user_id is not None and self.recent_writers.get(user_id) is not None
+
+    def replica_for_request(self):
+        """
+            The bind key reads of this request go to, None for the primary
+        """
+        if 'replica_key' not in g:
+            key = None
+            if self.keys and self.routed() and not self.wrote_recently():
+                key = random.choice(self.keys)
+            g.replica_key = key
+        return g.replica_key
+
+    def count(self, replica):
+        with self._lock:
+            if replica:
+                self.replica_reads += 1
+            else:
+                self.primary_reads += 1
+
+    def remember_write(self, response):
+        if request.method in READ_METHODS or request.method == 'OPTIONS' or response.status_code >= 400:
+            return response
+        user_id = _user_id()
+        if user_id is not None:
+            self.recent_writers.set(user_id, True)
+        response.set_cookie(LAST_WRITE_COOKIE, f'{time.time():.3f}', max_age=self.sticky_seconds,
+                            httponly=True, samesite='Lax')
+        return response
+
+
+def _user_id():
+    try:
+        return get_jwt().get('uid')
+    except RuntimeError:
+        # no verified token in this request
+        return None
+
+
+class RoutingSession(Session):
+    """
+        Sends plain SELECTs to the replica the request was given. Writes,
+        flushes, SELECT ... FOR UPDATE and anything after a write in the same
+        request use the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context() and 'replicas' in current_app.extensions:
+            router = current_app.extensions['replicas']
+            is_read = (isinstance(clause, Select) and clause._for_update_arg is None
+                       and not self._flushing and not g.get('replica_wrote'))
+            if is_read:
+                key = router.replica_for_request()
+                router.count(key is not None)
+                if key is not None:
+                    return self._db.engines[key]
+            elif clause is not None or self._flushing:
+                g.replica_wrote = True
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _sqlite_path(engine):
+    return engine.url.database if engine.dialect.name == 'sqlite' else None
+
+
+def init_app(app, db):
+    keys = sorted(key for key in app.config.get('SQLALCHEMY_BINDS') or {} if str(key).startswith(REPLICA_PREFIX))
+    if not keys:
+        return
+
+    router = app.extensions['replicas'] = ReplicaRouter(
+        keys,
+        namespaces=app.config['REPLICA_NAMESPACES'],
+        sticky_seconds=app.config['REPLICA_STICKY_SECONDS']
+    )
+    app.after_request(router.remember_write)
+
+    # a write that reaches a SQLite replica fails instead of diverging from the primary
+    def query_only(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+    with app.app_context():
+        for key in keys:
+            if db.engines[key].dialect.name == 'sqlite':
+                event.listen(db.engines[key], 'connect', query_only)
+
+
+def register_commands(app):
+
+    @app.cli.command('sync-sqlite-replicas')
+    def sync_sqlite_replicas():
+        """
+            Copy the SQLite primary over the SQLite replica files, for local setups
+        """
+        # the db instance, replicas is imported before it exists
+        db = app.extensions['sqlalchemy']
+        keys = app.extensions['replicas'].keys if 'replicas' in app.extensions else []
+        primary = _sqlite_path(db.engine)
+        if not primary:
+            raise click.ClickException("The primary is not a SQLite file")
+        source = sqlite3.connect(primary)
+        try:
+            for key in keys:
+                path = _sqlite_path(db.engines[key])
+                if not path or os.path.abspath(path) == os.path.abspath(primary):
+                    continue
+                target = sqlite3.connect(path)
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                click.echo(f"{key}: copied {primary} to {path}")
+        finally:
+            source.close()
+        # replica connections opened before the copy may hold stale pages
+        for key in keys:
+            db.engines[key].dispose()
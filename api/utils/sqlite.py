@@ -0,0 +1,30 @@
+#pragmas set on every new SQLite connection
+from sqlalchemy import event
+
+
+def init_app(app, db):
+    if not app.config['SQLITE_TUNING']:
+        return
+
+    with app.app_context():
+        # the primary and every replica bind
+        engines = [engine for engine in db.engines.values() if engine.dialect.name == 'sqlite']
+    if not engines:
+        return
+
+    pragmas = [
+        f"PRAGMA journal_mode={app.config['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA synchronous={app.config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA busy_timeout={int(app.config['SQLITE_BUSY_TIMEOUT'])}",
+        f"PRAGMA cache_size={int(app.config['SQLITE_CACHE_SIZE'])}",
+        f"PRAGMA mmap_size={int(app.config['SQLITE_MMAP_SIZE'])}",
+    ]
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    for engine in engines:
+        event.listen(engine, 'connect', set_pragmas)
@@ -0,0 +1,14 @@
+#entry point for ASGI servers, e.g.
+#   pip install -r Requirements-async.txt
+#   uvicorn asgi:app --workers 4
+#same routes and config as wsgi.py (prod unless APP_CONFIG says otherwise), each request on the
+#event loop and the database through the async driver of its URL (aiosqlite, asyncpg...), see api/utils/aio.py
+from api import create_app
+from api.config.config import config_from_env
+from api.utils.aio import AsyncApp, async_config
+
+app = AsyncApp(create_app(async_config(config_from_env(default='prod')), commands=False))
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app)
@@ -0,0 +1 @@
+#benchmarks for the API, run them with python -m benchmarks.<name> --help
@@ -0,0 +1,72 @@
+"""
+    Bytes on the wire and CPU per request for the big order responses, per encoding and level
+
+    python -m benchmarks.compression --orders 5000 --iterations 20
+"""
+import argparse
+import sys
+import time
+from api.utils import compression
+from .harness import make_app, seed, auth_headers, percentile, print_table
+
+
+ROUTES = {
+    'GET /orders/': '/orders/',
+    'GET /orders/?limit=100': '/orders/?limit=100',
+    'GET /orders/export': '/orders/export',
+}
+
+
+def settings():
+    yield 'identity', None, {}
+    for level in (1, 6, 9):
+        yield f'gzip {level}', 'gzip', {'COMPRESS_LEVEL': level}
+    if compression.brotli is not None:
+        for quality in (1, 4, 11):
+            yield f'br {quality}', 'br', {'COMPRESS_BROTLI_QUALITY': quality}
+
+
+def measure(client, path, headers, iterations):
+    sizes, cpu, wall = [], [], []
+    for _ in range(iterations):
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        response = client.get(path, headers=headers)
+        # streamed bodies are produced while they are read
+        body = response.get_data()
+        cpu.append((time.process_time() - cpu_start) * 1000)
+        wall.append((time.perf_counter() - wall_start) * 1000)
+        if response.status_code != 200:
+            raise AssertionError(f"GET {path}: {response.status_code}")
+        sizes.append(len(body))
+    return {
+        'bytes': sizes[-1],
+        'cpu_ms': percentile(cpu, 50),
+        'p50_ms': percentile(wall, 50),
+        'p95_ms': percentile(wall, 95),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=2000)
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    app = make_app()
+    seed(app, orders=args.orders)
+    client = app.test_client()
+    admin = auth_headers(app, 1)
+
+    results = {}
+    for name, path in ROUTES.items():
+        for label, encoding, overrides in settings():
+            app.config.update(overrides)
+            headers = dict(admin, **({'Accept-Encoding': encoding} if encoding else {}))
+            measure(client, path, headers, 2)
+            results[f'{name} {label}'] = measure(client, path, headers, args.iterations)
+    print_table(results, ['bytes', 'cpu_ms', 'p50_ms', 'p95_ms'])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
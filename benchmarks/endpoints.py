@@ -0,0 +1,149 @@
+"""
+    Time every route of the orders and auth namespaces through the test client
+
+    python -m benchmarks.endpoints --orders 5000 --save benchmarks/baseline.json
+    python -m benchmarks.endpoints --orders 5000 --baseline benchmarks/baseline.json --margin 0.5
+"""
+import argparse
+import itertools
+import random
+import statistics
+import sys
+from api.models.orders import Order
+from api.utils import db
+from .harness import (make_app, seed, random_order, auth_headers, StatementCounter, timed, percentile,
+                      load_baseline, save_baseline, regressions, print_table)
+
+
+# orders moved by one bulk status change
+BULK_STATUS = 20
+
+
+def routes(app, client, users):
+    """
+        (name, call) pairs, every call sends one request and checks its status
+    """
+    rng = random.Random(1)
+    admin = auth_headers(app, 1)
+    client_id = 2
+    owner = auth_headers(app, client_id)
+    refresh = auth_headers(app, client_id, refresh=True)
+
+    with app.app_context():
+        ids = [row.id for row in db.session.query(Order.id).order_by(Order.id)]
+        owned = db.session.query(Order.id).filter_by(user_id=client_id).first().id
+    # orders that get their status changed or get deleted, never twice
+    to_patch = iter(ids[:len(ids) // 2])
+    to_delete = iter(reversed(ids[len(ids) // 2:]))
+
+    def bulk():
+        return list(itertools.islice(to_patch, BULK_STATUS))
+
+    names = itertools.count()
+    # every call after the first is answered from the stored response
+    retried_order = random_order(rng)
+
+    def call(method, path, status, headers=None, **kwargs):
+        response = getattr(client, method)(path, headers=headers, **kwargs)
+        if response.status_code != status:
+            raise AssertionError(f"{method.upper()} {path}: {response.status_code} {response.data[:200]!r}")
+        return response
+
+    return [
+        ('POST /auth/signup', lambda: call('post', '/auth/signup', 201, json={
+            'userName': f'signup{next(names)}', 'Email': f'signup{next(names)}@bench',
+            'password': 'password', 'role': 'CLIENT'})),
+        ('POST /auth/login', lambda: call('post', '/auth/login', 200, json={
+            'Email': 'client0@bench', 'password': 'password'})),
+        ('POST /auth/refresh', lambda: call('post', '/auth/refresh', 200, headers=refresh)),
+        ('GET /orders/ (admin)', lambda: call('get', '/orders/', 200, headers=admin)),
+        ('GET /orders/ (client)', lambda: call('get', '/orders/', 200, headers=owner)),
+        ('GET /orders/?limit=50', lambda: call('get', '/orders/?limit=50', 200, headers=admin)),
+        ('GET /orders/?status=&color=&sort=', lambda: call(
+            'get', '/orders/?status=PENDING&color=BLACK,RED&sort=-date_created&limit=50', 200, headers=admin)),
+        ('POST /orders/', lambda: call('post', '/orders/', 201, headers=owner, json=random_order(rng))),
+        ('POST /orders/ (Idempotency-Key retry)', lambda: call('post', '/orders/', 201, json=retried_order,
+                                                               headers=dict(owner, **{'Idempotency-Key': 'bench'}))),
+        ('POST /orders/batch (20)', lambda: call('post', '/orders/batch', 201, headers=owner,
+                                                 json=[random_order(rng) for _ in range(20)])),
+        ('GET /orders/export', lambda: call('get', '/orders/export', 200, headers=admin).get_data()),
+        ('GET /orders/stats', lambda: call('get', '/orders/stats?group_by=day,order_status,color',
+                                           200, headers=admin)),
+        ('GET /orders/<id>', lambda: call('get', f'/orders/{owned}', 200, headers=owner)),
+        ('PUT /orders/<id>', lambda: call('put', f'/orders/{owned}', 200, headers=owner,
+                                          json=random_order(rng))),
+        ('DELETE /orders/<id>', lambda: call('delete', f'/orders/{next(to_delete)}', 204, headers=admin)),
+        ('GET /orders/user/<id>/order/<id>', lambda: call('get', f'/orders/user/{client_id}/order/{owned}',
+                                                           200, headers=owner)),
+        ('GET /orders/user/<id>/orders', lambda: call('get', f'/orders/user/{client_id}/orders',
+                                                      200, headers=owner)),
+        ('PATCH /orders/status/<id>', lambda: call('patch', f'/orders/status/{next(to_patch)}', 200,
+                                                   headers=admin, json={'order_status': 'IN_PROGRESS'})),
+        (f'PATCH /orders/status ({BULK_STATUS})', lambda: call('patch', '/orders/status', 200, headers=admin,
+                                                        json={'order_ids': bulk(), 'order_status': 'CANCELED'})),
+        ('GET /orders/resources', lambda: call('get', '/orders/resources', 200, headers=admin)),
+        ('POST /orders/resources', lambda: call('post', '/orders/resources', 201, headers=admin, json={
+            'type': 'COLOR', 'name': f'BENCH{next(names)}', 'quantity': 10})),
+        ('PUT /orders/resources/<id>', lambda: call('put', '/orders/resources/1', 200, headers=admin, json={
+            'type': 'COLOR', 'name': 'RED', 'quantity': 10**9})),
+    ]
+
+
+def run(users, orders, iterations, only=None):
+    app = make_app()
+    # the status changes take 1 + BULK_STATUS orders per round from the first half, deletes one from the second
+    seed(app, users=users, orders=max(orders, 2 * (BULK_STATUS + 2) * (iterations + 3)))
+    client = app.test_client()
+    with app.app_context():
+        counter = StatementCounter(db.engine)
+
+    results = {}
+    for name, call in routes(app, client, users):
+        if only and only not in name:
+            continue
+        statements = []
+
+        def measured():
+            with counter.measure() as m:
+                call()
+            statements.append(m['statements'])
+
+        samples = timed(measured, iterations)
+        results[name] = {
+            'p50_ms': percentile(samples, 50),
+            'p95_ms': percentile(samples, 95),
+            'statements': int(statistics.median(statements)),
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--orders', type=int, default=1000)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--only', help="run the routes whose name contains this")
+    parser.add_argument('--baseline', help="fail when this saved run is exceeded")
+    parser.add_argument('--margin', type=float, default=0.5, help="allowed p95 slowdown, 0.5 is 50%%")
+    parser.add_argument('--query-margin', type=int, default=0, help="allowed extra statements per request")
+    parser.add_argument('--save', help="write this run as the new baseline")
+    args = parser.parse_args(argv)
+
+    results = run(args.users, args.orders, args.iterations, args.only)
+    print_table(results, ['p50_ms', 'p95_ms', 'statements'])
+
+    if args.save:
+        save_baseline(args.save, results)
+
+    baseline = load_baseline(args.baseline)
+    if baseline is not None:
+        failures = regressions(results, baseline, args.margin, args.query_margin)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        if failures:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+#shared pieces of the benchmarks: the app, the seed data and the timers
+import json
+import os
+import random
+import time
+from contextlib import contextmanager
+from flask_jwt_extended import create_access_token, create_refresh_token
+from sqlalchemy import event, insert
+from werkzeug.security import generate_password_hash
+from api import create_app
+from api.auth.identity import identity_claims
+from api.config.config import config_dict
+from api.orders import stats
+from api.models.orders import Order, Resource, Sizes, Colors, PrintDesigns, Materials
+from api.models.users import User
+from api.utils import db
+
+
+class BenchConfig(config_dict['testing']):
+    # echoing every statement would be most of what gets measured
+    SQLALCHEMY_ECHO = False
+
+
+def make_app(config=BenchConfig):
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def seed(app, users=10, orders=1000, stock=10**9, seed=0):
+    """
+        Admin is user 1, clients are users 2..users+1. Every color and
+        material gets stock units, orders are spread over the clients.
+    """
+    rng = random.Random(seed)
+    password = generate_password_hash('password')
+    with app.app_context():
+        db.session.execute(insert(User), [
+            {'userName': 'admin', 'Email': 'admin@bench', 'password': password, 'role': 'ADMIN'}
+        ] + [
+            {'userName': f'client{i}', 'Email': f'client{i}@bench', 'password': password, 'role': 'CLIENT'}
+            for i in range(users)
+        ])
+        db.session.execute(insert(Resource),
+            [{'type': 'COLOR', 'name': color.name, 'quantity': stock} for color in Colors] +
+            [{'type': 'MATERIAL', 'name': material.name, 'quantity': stock} for material in Materials])
+        if orders:
+            db.session.execute(insert(Order), [random_order(rng, user_id=rng.randint(2, users + 1))
+                                               for _ in range(orders)])
+        db.session.commit()
+        stats.rebuild()
+
+
+def random_order(rng, **extra):
+    order = {
+        'size': rng.choice(list(Sizes)).name,
+        'color': rng.choice(list(Colors)).name,
+        'design': rng.choice(list(PrintDesigns)).name,
+        'material': rng.choice(list(Materials)).name,
+        'quantity': rng.randint(1, 3),
+    }
+    order.update(extra)
+    return order
+
+
+def auth_headers(app, user_id, refresh=False):
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        make_token = create_refresh_token if refresh else create_access_token
+        token = make_token(identity=user.userName, additional_claims=identity_claims(user))
+    return {'Authorization': f'Bearer {token}'}
+
+
+class StatementCounter:
+    """
+        Counts the statements sent to the database while active
+    """
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._count)
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    @contextmanager
+    def measure(self):
+        start = self.count
+        result = {}
+        yield result
+        result['statements'] = self.count - start
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def timed(fn, iterations, warmup=3):
+    """
+        Per call timings in milliseconds
+    """
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def load_baseline(path):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path, results):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def regressions(results, baseline, margin, query_margin=0):
+    """
+        What got slower than baseline * (1 + margin) or sends more statements
+    """
+    failures = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if current['p95_ms'] > before['p95_ms'] * (1 + margin):
+            failures.append(f"{name}: p95 {current['p95_ms']:.2f}ms > baseline {before['p95_ms']:.2f}ms")
+        if 'statements' in before and current['statements'] > before['statements'] + query_margin:
+            failures.append(f"{name}: {current['statements']} statements > baseline {before['statements']}")
+    return failures
+
+
+def print_table(results, columns):
+    names = list(results)
+    width = max([len(n) for n in names] + [5])
+    print(f"{'bench':<{width}}  " + "  ".join(f"{c:>12}" for c in columns))
+    for name in names:
+        row = results[name]
+        cells = []
+        for c in columns:
+            value = row.get(c, '')
+            cells.append(f"{value:>12.2f}" if isinstance(value, float) else f"{value!s:>12}")
+        print(f"{name:<{width}}  " + "  ".join(cells))
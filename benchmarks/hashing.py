@@ -0,0 +1,64 @@
+"""
+    Login throughput at several password hash costs
+
+    python -m benchmarks.hashing --method scrypt --costs 8192 16384 32768 --concurrency 8
+    python -m benchmarks.hashing --method pbkdf2 --costs 100000 300000 600000
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import generate_password_hash
+from api.auth.passwords import method_string
+from api.models.users import User
+from api.utils import db
+from .harness import BenchConfig, make_app, seed, print_table
+
+
+def login_throughput(method, cost, logins, concurrency, workers):
+    class Config(BenchConfig):
+        PASSWORD_HASH_METHOD = method
+        PASSWORD_HASH_COST = cost
+        PASSWORD_HASH_WORKERS = workers
+        PASSWORD_HASH_MAX_PENDING = max(concurrency, workers)
+        PASSWORD_HASH_TIMEOUT = 60.0
+
+    app = make_app(Config)
+    seed(app, users=1, orders=0)
+    with app.app_context():
+        # stored at the benchmarked cost, so no login triggers a rehash
+        user = User.query.filter_by(Email='client0@bench').first()
+        user.password = generate_password_hash('password', method_string(method, cost))
+        db.session.commit()
+
+    def login(_):
+        response = app.test_client().post('/auth/login', json={'Email': 'client0@bench', 'password': 'password'})
+        if response.status_code != 200:
+            raise AssertionError(response.data)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(login, range(logins)))
+    elapsed = time.perf_counter() - start
+    return {'logins_per_s': logins / elapsed, 'ms_per_login': elapsed * 1000 / logins * concurrency}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--method', default='scrypt')
+    parser.add_argument('--costs', type=int, nargs='+', default=[8192, 16384, 32768])
+    parser.add_argument('--logins', type=int, default=40)
+    parser.add_argument('--concurrency', type=int, default=8, help="request threads logging in at once")
+    parser.add_argument('--workers', type=int, default=2, help="PASSWORD_HASH_WORKERS")
+    args = parser.parse_args(argv)
+
+    results = {
+        method_string(args.method, cost): login_throughput(args.method, cost, args.logins, args.concurrency, args.workers)
+        for cost in args.costs
+    }
+    print_table(results, ['logins_per_s', 'ms_per_login'])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""
+    Job queue throughput: enqueueing, then draining the queue with the worker pool
+
+    python -m benchmarks.jobs --jobs 5000 --workers 1 2 4 --batch-size 1 20
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from api.jobs import queue
+from api.jobs.worker import Worker
+from api.utils import db
+from .harness import BenchConfig, make_app, print_table
+
+
+@queue.handler('bench_noop')
+def noop(payload):
+    pass
+
+
+def make_queue_app(path):
+
+    class Config(BenchConfig):
+        # a file, the workers are threads with connections of their own
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + path
+
+    return make_app(Config)
+
+
+def enqueue_throughput(app, jobs, per_commit):
+    with app.app_context():
+        start = time.perf_counter()
+        for first in range(0, jobs, per_commit):
+            count = min(per_commit, jobs - first)
+            if count == 1:
+                queue.enqueue('bench_noop', {'n': first})
+            else:
+                queue.enqueue_many('bench_noop', [{'n': n} for n in range(first, first + count)])
+            db.session.commit()
+        elapsed = time.perf_counter() - start
+    return {'jobs_per_s': jobs / elapsed, 'ms_per_job': elapsed * 1000 / jobs}
+
+
+def process_throughput(app, jobs, workers, batch_size):
+    with app.app_context():
+        queue.enqueue_many('bench_noop', [{'n': n} for n in range(jobs)])
+        db.session.commit()
+
+    worker = Worker(app, workers=workers, batch_size=batch_size, poll_interval=0.01, visibility_timeout=60)
+    start = time.perf_counter()
+    worker.run(burst=True)
+    elapsed = time.perf_counter() - start
+    if worker.processed != jobs:
+        raise AssertionError(f"{worker.processed} of {jobs} jobs done, {worker.failed} failed")
+    return {'jobs_per_s': jobs / elapsed, 'ms_per_job': elapsed * 1000 / jobs}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, default=2000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--batch-size', type=int, nargs='+', default=[1, 20])
+    args = parser.parse_args(argv)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_queue_app(os.path.join(directory, 'jobs.sqlite3'))
+        for per_commit in (1, 100):
+            results[f'enqueue, {per_commit} per commit'] = enqueue_throughput(app, args.jobs, per_commit)
+        # start the workers on an empty queue
+        Worker(app, workers=1, batch_size=1000, poll_interval=0, visibility_timeout=60).run(burst=True)
+
+        for workers in args.workers:
+            for batch_size in args.batch_size:
+                results[f'process, {workers} workers, batch {batch_size}'] = process_throughput(
+                    app, args.jobs, workers, batch_size)
+    print_table(results, ['jobs_per_s', 'ms_per_job'])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,48 @@
+"""
+    Order list serialization: ORM + flask-restx marshalling against the Core serializer
+
+    python -m benchmarks.serialization --orders 10000
+"""
+import argparse
+import sys
+from flask_restx import marshal
+from api.models.orders import Order, Resource
+from api.orders import serializers
+from api.orders.views import order_model, resource_model
+from .harness import make_app, seed, timed, percentile, print_table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=10000)
+    parser.add_argument('--iterations', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    app = make_app()
+    seed(app, users=10, orders=args.orders)
+
+    with app.test_request_context():
+        if marshal(Order.query.all(), order_model) != serializers.orders():
+            raise AssertionError("the serializer output differs from order_model")
+        if marshal(Resource.query.all(), resource_model) != serializers.resources():
+            raise AssertionError("the serializer output differs from resource_model")
+
+        cases = {
+            'orders: ORM + marshal': lambda: marshal(Order.query.all(), order_model),
+            'orders: Core serializer': serializers.orders,
+        }
+        results = {}
+        for name, fn in cases.items():
+            samples = timed(fn, args.iterations, warmup=1)
+            results[name] = {
+                'p50_ms': percentile(samples, 50),
+                'p95_ms': percentile(samples, 95),
+                'us_per_row': percentile(samples, 50) * 1000 / args.orders,
+            }
+
+    print_table(results, ['p50_ms', 'p95_ms', 'us_per_row'])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""
+    Requests per second and latency at several concurrency levels, the
+    threaded WSGI app against AsyncApp on the async driver (needs aiosqlite,
+    or asyncpg with --database-url). Both run in process, without sockets
+
+    python -m benchmarks.serving --orders 2000 --requests 400 --concurrency 1,8,32
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from api import create_app
+from api.utils.aio import AsyncApp, async_config
+from .harness import BenchConfig, make_app, seed, random_order, auth_headers, percentile, print_table
+
+
+def workload(count, orders, seed=0):
+    """
+        (method, path, body) of a mix of list, lookup and create requests
+    """
+    rng = random.Random(seed)
+    requests = []
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            requests.append(('GET', '/orders/user/2/orders?limit=50', None))
+        elif kind == 1:
+            requests.append(('GET', f'/orders/{rng.randint(1, orders)}', None))
+        elif kind == 2:
+            requests.append(('GET', '/orders/?limit=50', None))
+        else:
+            requests.append(('POST', '/orders/', random_order(rng)))
+    return requests
+
+
+def summary(latencies, elapsed):
+    return {
+        'req_per_s': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+    }
+
+
+def run_wsgi(app, requests, headers, concurrency):
+    def call(request):
+        method, path, body = request
+        client = app.test_client()
+        start = time.perf_counter()
+        response = client.open(path, method=method, json=body, headers=headers)
+        if response.status_code >= 300:
+            raise AssertionError(f"{method} {path}: {response.status_code}")
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(call, requests))
+    return summary(latencies, time.perf_counter() - start)
+
+
+async def asgi_call(app, method, path, headers, body=None):
+    path, _, query = path.partition('?')
+    data = json.dumps(body).encode() if body is not None else b''
+    scope = {
+        'type': 'http', 'method': method, 'path': path, 'query_string': query.encode(),
+        'http_version': '1.1', 'scheme': 'http', 'server': ('bench', 80), 'client': ('127.0.0.1', 0),
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(data)).encode())]
+                   + [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+    }
+    response = {}
+
+    async def receive():
+        return {'type': 'http.request', 'body': data, 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+
+    await app(scope, receive, send)
+    return response['status']
+
+
+async def run_asgi(app, requests, headers, concurrency):
+    slots = asyncio.Semaphore(concurrency)
+
+    async def call(request):
+        method, path, body = request
+        async with slots:
+            start = time.perf_counter()
+            status = await asgi_call(app, method, path, headers, body)
+            if status >= 300:
+                raise AssertionError(f"{method} {path}: {status}")
+            return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(call(request) for request in requests))
+    return summary(latencies, time.perf_counter() - start)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """
+        Startup and shutdown as an ASGI server sends them, the shutdown closes the pooled connections
+    """
+    messages, replies = asyncio.Queue(), asyncio.Queue()
+    task = asyncio.create_task(app({'type': 'lifespan'}, messages.get, replies.put))
+    await messages.put({'type': 'lifespan.startup'})
+    await replies.get()
+    try:
+        yield
+    finally:
+        await messages.put({'type': 'lifespan.shutdown'})
+        await replies.get()
+        await task
+
+
+async def run_asgi_levels(app, levels, headers):
+    async with lifespan(app):
+        return {concurrency: await run_asgi(app, requests, headers, concurrency)
+                for concurrency, requests in levels.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', default='1,8,32', help="comma separated levels")
+    parser.add_argument('--database-url', help="a server database, with its sync driver")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = args.database_url or 'sqlite:///' + os.path.join(directory, 'serving.sqlite3')
+
+        class Config(BenchConfig):
+            SQLALCHEMY_DATABASE_URI = url
+
+        app = make_app(Config)
+        seed(app, orders=args.orders)
+        headers = auth_headers(app, 1)
+        async_app = AsyncApp(create_app(async_config(Config), commands=False))
+
+        levels = {int(value): workload(args.requests, args.orders, seed=int(value))
+                  for value in args.concurrency.split(',')}
+        threaded = {concurrency: run_wsgi(app, requests, headers, concurrency)
+                    for concurrency, requests in levels.items()}
+        # one event loop for every level, as a server would run
+        evented = asyncio.run(run_asgi_levels(async_app, levels, headers))
+
+    results = {}
+    for concurrency in levels:
+        results[f'wsgi threads x{concurrency}'] = threaded[concurrency]
+        results[f'asgi tasks x{concurrency}'] = evented[concurrency]
+    print_table(results, ['req_per_s', 'p50_ms', 'p95_ms'])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""
+    Concurrent order writes on a SQLite file, with and without the connection pragmas
+
+    python -m benchmarks.sqlite_tuning --threads 8 --orders 200
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .harness import BenchConfig, make_app, seed, random_order, auth_headers, print_table
+
+
+def write_throughput(tuned, threads, orders, directory):
+    path = os.path.join(directory, f"{'tuned' if tuned else 'default'}.sqlite3")
+
+    class Config(BenchConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + path
+        SQLITE_TUNING = tuned
+        # the default journal, without a busy timeout writers fail instead of waiting
+        SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': 30}}
+
+    app = make_app(Config)
+    seed(app, users=threads, orders=0)
+    headers = [auth_headers(app, user_id) for user_id in range(2, threads + 2)]
+
+    def writer(n):
+        rng = random.Random(n)
+        client = app.test_client()
+        for _ in range(orders // threads):
+            response = client.post('/orders/', json=random_order(rng), headers=headers[n])
+            if response.status_code != 201:
+                raise AssertionError(response.data)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(writer, range(threads)))
+    elapsed = time.perf_counter() - start
+    written = orders // threads * threads
+    return {'orders_per_s': written / elapsed, 'ms_per_order': elapsed * 1000 / written}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--orders', type=int, default=400)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = {
+            'default pragmas': write_throughput(False, args.threads, args.orders, directory),
+            'WAL + synchronous=NORMAL': write_throughput(True, args.threads, args.orders, directory),
+        }
+    print_table(results, ['orders_per_s', 'ms_per_order'])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
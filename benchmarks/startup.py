@@ -0,0 +1,83 @@
+"""
+    Cold start: each sample is a fresh interpreter that imports the app,
+    builds it and serves its first request
+
+    python -m benchmarks.startup --runs 10 --save startup.json
+    python -m benchmarks.startup --runs 10 --baseline startup.json --margin 0.3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from .harness import percentile, load_baseline, save_baseline, regressions, print_table
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# runs in the child, prints the milliseconds of every phase as JSON
+PROBE = """
+import json, time
+start = time.perf_counter()
+from api import create_app
+imported = time.perf_counter()
+app = create_app(commands={commands})
+created = time.perf_counter()
+app.test_client().get('/orders/')
+served = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (served - created) * 1000,
+    'total_ms': (served - start) * 1000,
+}}))
+"""
+
+
+def sample(commands):
+    env = dict(os.environ, APP_CONFIG='testing')
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE.format(commands=commands)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(commands, runs):
+    samples = [sample(commands) for _ in range(runs)]
+    results = {}
+    for phase in ('import_ms', 'create_app_ms', 'first_request_ms', 'total_ms'):
+        values = [s[phase] for s in samples]
+        results[phase] = {'p50_ms': percentile(values, 50), 'p95_ms': percentile(values, 95)}
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--baseline', help="fail when this saved run is exceeded")
+    parser.add_argument('--margin', type=float, default=0.3, help="allowed p95 slowdown, 0.3 is 30%%")
+    parser.add_argument('--save', help="write this run as the new baseline")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for label, commands in (('wsgi (commands=False)', False), ('cli (commands=True)', True)):
+        for phase, timing in measure(commands, args.runs).items():
+            results[f'{label} {phase}'] = timing
+    print_table(results, ['p50_ms', 'p95_ms'])
+
+    if args.save:
+        save_baseline(args.save, results)
+
+    baseline = load_baseline(args.baseline)
+    if baseline is not None:
+        failures = regressions(results, baseline, args.margin)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        if failures:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
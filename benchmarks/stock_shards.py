@@ -0,0 +1,102 @@
+"""
+    Concurrent orders of one color and material against the number of stock
+    shards, with less stock than the orders ask for, checking nothing is oversold
+
+    python -m benchmarks.stock_shards --threads 8 --orders 400 --shards 1,2,4,8
+    python -m benchmarks.stock_shards --database-url postgresql://localhost/bench
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import func, select, update
+from api.models.orders import Order, Resource, ResourceShard
+from api.orders import shards
+from api.utils import db
+from .harness import BenchConfig, make_app, seed, random_order, auth_headers, print_table
+
+
+def order_throughput(count, threads, orders, stock, url):
+    class Config(BenchConfig):
+        SQLALCHEMY_DATABASE_URI = url
+        STOCK_SHARDS = count
+        # the inventory cache would turn most orders away before they reach the rows
+        INVENTORY_CACHE_ENABLED = False
+
+    app = make_app(Config)
+    with app.app_context():
+        # a server database is reused between runs
+        db.drop_all()
+        db.create_all()
+    seed(app, users=threads, orders=0)
+    with app.app_context():
+        db.session.execute(
+            update(Resource)
+            .where(Resource.name.in_(('BLACK', 'COTTON')))
+            .values(quantity=stock)
+        )
+        db.session.commit()
+        shards.rebalance(count)
+    headers = [auth_headers(app, user_id) for user_id in range(2, threads + 2)]
+
+    def writer(n):
+        rng = random.Random(n)
+        client = app.test_client()
+        statuses = []
+        for _ in range(orders // threads):
+            response = client.post('/orders/', json=random_order(rng, color='BLACK', material='COTTON'),
+                                   headers=headers[n])
+            if response.status_code not in (201, 400):
+                raise AssertionError(response.data)
+            statuses.append(response.status_code)
+        return statuses
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        statuses = [status for result in pool.map(writer, range(threads)) for status in result]
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        sold = db.session.execute(select(func.coalesce(func.sum(Order.quantity), 0))).scalar()
+        left = {row.name: row.quantity for row in db.session.execute(
+            shards.stock_select().where(Resource.name.in_(('BLACK', 'COTTON'))))}
+        negative = db.session.execute(
+            select(func.count()).select_from(ResourceShard).where(ResourceShard.quantity < 0)
+        ).scalar()
+    for name, quantity in left.items():
+        if sold + quantity != stock or quantity < 0 or negative:
+            raise AssertionError(f"{name}: {sold} sold + {quantity} left != {stock} in stock")
+
+    return {
+        'orders_per_s': len(statuses) / elapsed,
+        'ms_per_order': elapsed * 1000 / len(statuses),
+        'created': statuses.count(201),
+        'out_of_stock': statuses.count(400),
+        'left': left['BLACK'],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--orders', type=int, default=400)
+    parser.add_argument('--shards', default='1,2,4,8', help="comma separated shard counts")
+    parser.add_argument('--stock', type=int, help="units of the color, 1.5 per order by default")
+    parser.add_argument('--database-url', help="a server database, SQLite locks the whole file on every write")
+    args = parser.parse_args(argv)
+    stock = args.stock if args.stock is not None else args.orders * 3 // 2
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for count in (int(value) for value in args.shards.split(',')):
+            url = args.database_url or 'sqlite:///' + os.path.join(directory, f'shards{count}.sqlite3')
+            results[f'{count} shards'] = order_throughput(count, args.threads, args.orders, stock, url)
+    print_table(results, ['orders_per_s', 'ms_per_order', 'created', 'out_of_stock', 'left'])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
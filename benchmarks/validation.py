@@ -0,0 +1,115 @@
+"""
+    Order payload validation: the compiled validators against flask-restx
+    validate=True (order_model.validate) and a prebuilt jsonschema
+    validator of the same schema, then bad orders through the API
+
+    python -m benchmarks.validation --payloads 10000
+"""
+import argparse
+import random
+import sys
+from jsonschema import Draft4Validator
+from werkzeug.exceptions import HTTPException
+from api.orders import validation
+from api.orders.views import order_model
+from api.utils import db
+from .harness import make_app, seed, auth_headers, random_order, StatementCounter, timed, percentile, print_table
+
+
+# what a client gets wrong, each one turns a valid order invalid
+MISTAKES = [
+    lambda order: order.update(color='ORANGE'),
+    lambda order: order.update(size='small'),
+    lambda order: order.update(quantity='2'),
+    lambda order: order.update(quantity=0),
+    lambda order: order.pop('design'),
+    lambda order: order.update(material=['COTTON']),
+]
+
+
+def payloads(count, invalid_share, seed=0):
+    rng = random.Random(seed)
+    items = []
+    for _ in range(count):
+        # the restx model requires order_status too
+        order = random_order(rng, order_status='PENDING')
+        if rng.random() < invalid_share:
+            rng.choice(MISTAKES)(order)
+        items.append(order)
+    return items
+
+
+def restx_validate(items):
+    rejected = 0
+    for item in items:
+        try:
+            order_model.validate(item)
+        except HTTPException:
+            rejected += 1
+    return rejected
+
+
+def jsonschema_validate(validator, items):
+    return sum(not validator.is_valid(item) for item in items)
+
+
+def compiled_validate(items):
+    return sum(error is not None for error in validation.order.errors(items))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--payloads', type=int, default=10000)
+    parser.add_argument('--invalid-share', type=float, default=0.3)
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    items = payloads(args.payloads, args.invalid_share)
+    schema_validator = Draft4Validator(order_model.__schema__)
+    # the restx schema leaves quantity optional and unbounded, so it lets some of the mistakes through
+    if any(validation.order.error(item) is None and not schema_validator.is_valid(item) for item in items):
+        raise AssertionError("the compiled validator lets through an order the restx model rejects")
+
+    cases = {
+        'restx order_model.validate': lambda: restx_validate(items),
+        'jsonschema, prebuilt': lambda: jsonschema_validate(schema_validator, items),
+        'compiled validator': lambda: compiled_validate(items),
+    }
+    results = {}
+    for name, fn in cases.items():
+        samples = timed(fn, args.iterations, warmup=1)
+        results[name] = {
+            'rejected': fn(),
+            'p50_ms': percentile(samples, 50),
+            'us_per_payload': percentile(samples, 50) * 1000 / args.payloads,
+        }
+
+    app = make_app()
+    seed(app, orders=100)
+    headers = auth_headers(app, 2)
+    client = app.test_client()
+    with app.app_context():
+        counter = StatementCounter(db.engine)
+    bad = payloads(args.requests, invalid_share=1.0, seed=1)
+    for path, body in (('POST /orders/', iter(bad)), ('POST /orders/batch', iter([bad[:10]] * args.requests))):
+        url = path.split(' ', 1)[1]
+
+        def call():
+            response = client.post(url, json=next(body), headers=headers)
+            if response.status_code != 400:
+                raise AssertionError(f"{path}: {response.status_code}")
+
+        with counter.measure() as measured:
+            samples = timed(call, args.requests - 3)
+        results[f'{path} invalid'] = {
+            'p50_ms': percentile(samples, 50),
+            'statements': measured['statements'],
+        }
+
+    print_table(results, ['rejected', 'p50_ms', 'us_per_payload', 'statements'])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,43 @@
+"""Add order stats
+
+Revision ID: 2d7a5c9e8b13
+Revises: 9f2c6a1d7e40
+Create Date: 2026-10-18 17:21:05.318842
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2d7a5c9e8b13'
+down_revision = '9f2c6a1d7e40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('order_stats',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('order_status', sa.String(length=20), nullable=False),
+    sa.Column('size', sa.String(length=20), nullable=False),
+    sa.Column('color', sa.String(length=20), nullable=False),
+    sa.Column('design', sa.String(length=30), nullable=False),
+    sa.Column('material', sa.String(length=20), nullable=False),
+    sa.Column('orders', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'order_status', 'size', 'color', 'design', 'material')
+    )
+
+    # start from the orders already there, the write paths keep it up to date from now on
+    op.execute("""
+        INSERT INTO order_stats (day, order_status, size, color, design, material, orders, quantity)
+        SELECT date(date_created), order_status, size, color, design, material, count(*), coalesce(sum(quantity), 0)
+        FROM orders
+        WHERE date_created IS NOT NULL
+        GROUP BY date(date_created), order_status, size, color, design, material
+    """)
+
+
+def downgrade():
+    op.drop_table('order_stats')
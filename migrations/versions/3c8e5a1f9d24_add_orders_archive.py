@@ -0,0 +1,47 @@
+"""Add orders archive
+
+Revision ID: 3c8e5a1f9d24
+Revises: e7b2c4d9f031
+Create Date: 2026-10-18 21:48:10.265904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c8e5a1f9d24'
+down_revision = 'e7b2c4d9f031'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the enum types already exist, orders uses them
+    op.create_table('orders_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('size', sa.Enum('SMALL', 'MEDIUM', 'LARGE', 'EXTRA_LARGE', name='sizes', create_type=False), nullable=True),
+    sa.Column('color', sa.Enum('RED', 'BLUE', 'BLACK', 'WHITE', 'PINK', 'PURPLE', 'GREEN', name='colors', create_type=False), nullable=True),
+    sa.Column('design', sa.Enum('STRAW_HAT_JOLLY_ROGER', 'RORONOA_ZORO_SWORDS', 'GOING_MERRY', 'THOUSAND_SUNNY', 'MONKEY_D_LUFFY', 'PIRATE_KING', 'WANTED_POSTER', name='printdesigns', create_type=False), nullable=True),
+    sa.Column('material', sa.Enum('COTTON', 'POLYSTER', 'MIXED', name='materials', create_type=False), nullable=True),
+    sa.Column('order_status', sa.Enum('PENDING', 'IN_PROGRESS', 'SHIPPED', 'DELIVERED', 'CANCELED', 'RETURNED', name='orderstatus', create_type=False), nullable=True),
+    sa.Column('date_created', sa.DateTime(), nullable=True),
+    sa.Column('date_updated', sa.DateTime(), nullable=True),
+    sa.Column('quantity', sa.Integer(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('date_archived', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('orders_archive', schema=None) as batch_op:
+        batch_op.create_index('ix_orders_archive_user_id_date_created', ['user_id', 'date_created'], unique=False)
+
+
+def downgrade():
+    # the archived orders go back to orders first
+    columns = 'id, size, color, design, material, order_status, date_created, date_updated, quantity, user_id'
+    op.execute(f"INSERT INTO orders ({columns}) SELECT {columns} FROM orders_archive")
+    with op.batch_alter_table('orders_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_archive_user_id_date_created')
+
+    op.drop_table('orders_archive')
@@ -0,0 +1,40 @@
+"""Add hot query indexes
+
+Revision ID: 4b8e1f2a9d3c
+Revises: c953e04462fe
+Create Date: 2026-10-18 15:40:12.418230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b8e1f2a9d3c'
+down_revision = 'c953e04462fe'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index('ix_orders_user_id_date_created', ['user_id', 'date_created'], unique=False)
+        batch_op.create_index('ix_orders_order_status_date_created', ['order_status', 'date_created'], unique=False)
+
+    with op.batch_alter_table('resources', schema=None) as batch_op:
+        batch_op.create_index('ix_resources_type_name', ['type', 'name'], unique=True)
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index('ix_users_userName', ['userName'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index('ix_users_userName')
+
+    with op.batch_alter_table('resources', schema=None) as batch_op:
+        batch_op.drop_index('ix_resources_type_name')
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_order_status_date_created')
+        batch_op.drop_index('ix_orders_user_id_date_created')
@@ -0,0 +1,38 @@
+"""Orders ids are never reused
+
+Revision ID: 5d1a7b3e9c42
+Revises: 3c8e5a1f9d24
+Create Date: 2026-10-18 22:31:05.118402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d1a7b3e9c42'
+down_revision = '3c8e5a1f9d24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # server databases never hand out a sequence value twice, SQLite reuses
+    # the ids of deleted rows unless the table is AUTOINCREMENT
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('orders', recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+        pass
+    # past every id handed out so far, the archived ones too
+    op.execute("DELETE FROM sqlite_sequence WHERE name = 'orders'")
+    op.execute("""
+        INSERT INTO sqlite_sequence (name, seq)
+        SELECT 'orders', coalesce(max(id), 0) FROM (SELECT id FROM orders UNION ALL SELECT id FROM orders_archive)
+    """)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('orders', recreate='always', table_kwargs={'sqlite_autoincrement': False}):
+        pass
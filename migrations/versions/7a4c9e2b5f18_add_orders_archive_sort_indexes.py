@@ -0,0 +1,28 @@
+"""Add orders archive sort indexes
+
+Revision ID: 7a4c9e2b5f18
+Revises: 5d1a7b3e9c42
+Create Date: 2026-10-18 23:12:44.570231
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a4c9e2b5f18'
+down_revision = '5d1a7b3e9c42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('orders_archive', schema=None) as batch_op:
+        batch_op.create_index('ix_orders_archive_date_created', ['date_created'], unique=False)
+        batch_op.create_index('ix_orders_archive_date_updated', ['date_updated'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('orders_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_archive_date_updated')
+        batch_op.drop_index('ix_orders_archive_date_created')
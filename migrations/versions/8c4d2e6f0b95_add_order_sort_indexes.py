@@ -0,0 +1,28 @@
+"""Add order sort indexes
+
+Revision ID: 8c4d2e6f0b95
+Revises: 6e3b0f4c1a27
+Create Date: 2026-10-18 19:03:17.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4d2e6f0b95'
+down_revision = '6e3b0f4c1a27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index('ix_orders_date_created', ['date_created'], unique=False)
+        batch_op.create_index('ix_orders_date_updated', ['date_updated'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_date_updated')
+        batch_op.drop_index('ix_orders_date_created')
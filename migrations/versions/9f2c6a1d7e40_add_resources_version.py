@@ -0,0 +1,39 @@
+"""Add resources version
+
+Revision ID: 9f2c6a1d7e40
+Revises: 4b8e1f2a9d3c
+Create Date: 2026-10-18 16:02:47.903114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9f2c6a1d7e40'
+down_revision = '4b8e1f2a9d3c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('resources', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+
+    # writes made straight in the database bump the version too
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("""
+            CREATE TRIGGER IF NOT EXISTS resources_bump_version AFTER UPDATE ON resources
+            WHEN NEW.version = OLD.version
+            BEGIN
+                UPDATE resources SET version = OLD.version + 1 WHERE id = NEW.id;
+            END
+        """)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS resources_bump_version")
+
+    with op.batch_alter_table('resources', schema=None) as batch_op:
+        batch_op.drop_column('version')
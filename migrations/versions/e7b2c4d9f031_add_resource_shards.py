@@ -0,0 +1,36 @@
+"""Add resource shards
+
+Revision ID: e7b2c4d9f031
+Revises: a5f19c3e7d62
+Create Date: 2026-10-18 21:05:37.402815
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b2c4d9f031'
+down_revision = 'a5f19c3e7d62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('resource_shards',
+    sa.Column('resource_id', sa.Integer(), nullable=False),
+    sa.Column('shard', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['resource_id'], ['resources.id'], ),
+    sa.PrimaryKeyConstraint('resource_id', 'shard')
+    )
+
+
+def downgrade():
+    # the stock held by shards goes back to the resources first
+    op.execute(
+        "UPDATE resources SET quantity = quantity + COALESCE("
+        "(SELECT SUM(quantity) FROM resource_shards WHERE resource_shards.resource_id = resources.id), 0)"
+    )
+    op.drop_table('resource_shards')
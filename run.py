@@ -1,7 +1,6 @@
 from api import create_app
-#from api.config.config import config_dict
-#config=config_dict['production']
+#the config comes from APP_CONFIG (dev, prod or testing), dev by default
 app = create_app()
 
 if __name__ == "__main__":
-    app.run()
\ No newline at end of file
+    app.run()
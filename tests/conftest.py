@@ -0,0 +1,21 @@
+#fixtures shared by the tests: an app on a SQLite file of its own, with the tables of the models
+import pytest
+from api import create_app
+from api.config.config import config_dict
+from api.utils import db
+
+
+@pytest.fixture
+def app(tmp_path):
+    class Config(config_dict['testing']):
+        SQLALCHEMY_ECHO = False
+        # a file, so several threads see the same database
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / 'test.sqlite3')
+
+    app = create_app(Config, commands=False)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
@@ -0,0 +1,65 @@
+"""
+    The hot lookups are answered from their indexes, without a full table
+    scan or a sort. The statements are built as the views build them
+"""
+import pytest
+from sqlalchemy import select, text, update
+from api.models.orders import Order, Resource, OrderStatus
+from api.models.users import User
+from api.orders import archive, filters, serializers
+from api.utils import db
+
+
+def query_plan(stmt):
+    sql = str(stmt.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    return [row.detail for row in db.session.execute(text('EXPLAIN QUERY PLAN ' + sql))]
+
+
+def first_page(stmt, keys, descending):
+    """
+        The first page of an order list, as keyset_page sends it
+    """
+    return filters.ordered(stmt, keys, descending).limit(50)
+
+
+HOT_QUERIES = {
+    # GET /orders/ of a client
+    'orders of a user by date': (
+        lambda: first_page(*filters.apply(serializers.order_select().where(Order.user_id == 2), {})),
+        {'orders': 'ix_orders_user_id_date_created'}),
+    # GET /orders/?status=PENDING of an admin
+    'orders in a status by date': (
+        lambda: first_page(*filters.apply(serializers.order_select(), {'status': [OrderStatus.PENDING]})),
+        {'orders': 'ix_orders_order_status_date_created'}),
+    # GET /orders/user/<id>/orders, through the union with the archive
+    'orders and archived orders of a user': (
+        lambda: first_page(*archive.user_orders(2, {})),
+        {'orders': 'ix_orders_user_id_date_created', 'orders_archive': 'ix_orders_archive_user_id_date_created'}),
+    # GET /orders/?archived=true of an admin
+    'all orders and archived orders by date': (
+        lambda: first_page(*archive.orders({})),
+        {'orders': 'ix_orders_date_created', 'orders_archive': 'ix_orders_archive_date_created'}),
+    'all orders and archived orders by last update': (
+        lambda: first_page(*archive.orders({'sort': ('date_updated', True)})),
+        {'orders': 'ix_orders_date_updated', 'orders_archive': 'ix_orders_archive_date_updated'}),
+    'stock update of a resource': (
+        lambda: update(Resource).where(Resource.type == 'COLOR', Resource.name == 'RED')
+                                .values(quantity=Resource.quantity - 1),
+        {'resources': 'ix_resources_type_name'}),
+    'user by name': (
+        lambda: select(User.id).where(User.userName == 'client'),
+        {'users': 'ix_users_userName'}),
+}
+
+
+@pytest.mark.parametrize('name', HOT_QUERIES)
+def test_hot_query_uses_its_indexes(app, name):
+    build, indexes = HOT_QUERIES[name]
+    plan = query_plan(build())
+
+    for table, index in indexes.items():
+        # each side of a union reads its table through its index
+        assert any(detail.startswith(('SCAN', 'SEARCH')) and f' {table} ' in detail + ' '
+                   and f'INDEX {index}' in detail for detail in plan), (table, plan)
+    assert not any(detail.startswith('SCAN') and 'INDEX' not in detail for detail in plan), plan
+    assert not any('TEMP B-TREE' in detail for detail in plan), plan
@@ -0,0 +1,29 @@
+import os
+import pytest
+from api import create_app
+from api.config.config import config_dict
+
+
+@pytest.fixture
+def client(tmp_path):
+    class Config(config_dict['testing']):
+        SQLALCHEMY_ECHO = False
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / 'test.sqlite3')
+        METRICS_TOKEN = 'scrape'
+
+    return create_app(Config, commands=False).test_client()
+
+
+def test_metrics_requires_the_token(client):
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+
+
+def test_every_series_carries_the_worker_pid(client):
+    client.get('/metrics', headers={'Authorization': 'Bearer scrape'})
+    response = client.get('/metrics', headers={'Authorization': 'Bearer scrape'})
+
+    assert response.status_code == 200
+    series = [line for line in response.get_data(as_text=True).splitlines() if not line.startswith('#')]
+    assert series
+    assert all(f'pid="{os.getpid()}"' in line for line in series), series
@@ -0,0 +1,54 @@
+"""
+    Concurrent orders can't take more stock than there is
+"""
+import threading
+from sqlalchemy import select
+from werkzeug.exceptions import BadRequest
+from api.models.orders import Order, Resource
+from api.models.users import User
+from api.orders import reservations
+from api.utils import db
+
+
+STOCK = 10
+THREADS = 30
+
+
+def test_concurrent_orders_do_not_oversell(app):
+    db.session.add(User(userName='client', Email='client@test', password='x'))
+    db.session.add_all([
+        Resource(type='COLOR', name='RED', quantity=STOCK),
+        Resource(type='MATERIAL', name='COTTON', quantity=STOCK * THREADS),
+    ])
+    db.session.commit()
+
+    order = {'size': 'SMALL', 'color': 'RED', 'design': 'GOING_MERRY', 'material': 'COTTON', 'quantity': 1}
+    start = threading.Barrier(THREADS)
+    outcomes = []
+
+    def place():
+        with app.app_context():
+            start.wait()
+            try:
+                reservations.create_order(1, order)
+                outcomes.append('created')
+            except BadRequest as e:
+                outcomes.append(type(e).__name__)
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=place) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    db.session.expire_all()
+    red = db.session.execute(select(Resource.quantity).where(Resource.name == 'RED')).scalar_one()
+    created = db.session.execute(select(Order.id)).all()
+
+    assert len(outcomes) == THREADS
+    assert set(outcomes) <= {'created', 'OutOfStock'}, outcomes
+    assert red >= 0
+    assert outcomes.count('created') == STOCK == len(created)
+    assert red == 0
@@ -0,0 +1,48 @@
+"""
+    A resource name is unique per type: creating or renaming onto a taken one is a 409
+"""
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import select
+from api.auth.identity import identity_claims
+from api.models.orders import Resource
+from api.models.users import User
+from api.utils import db
+
+
+@pytest.fixture
+def admin_client(app):
+    admin = User(userName='admin', Email='admin@test', password='x', role='ADMIN')
+    db.session.add(admin)
+    db.session.add_all([
+        Resource(type='COLOR', name='RED', quantity=5),
+        Resource(type='COLOR', name='BLUE', quantity=5),
+    ])
+    db.session.commit()
+    token = create_access_token(identity=admin.userName, additional_claims=identity_claims(admin))
+    client = app.test_client()
+    client.environ_base['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+    return client
+
+
+def names():
+    db.session.expire_all()
+    return db.session.execute(select(Resource.name).order_by(Resource.id)).scalars().all()
+
+
+def test_creating_a_taken_name_is_a_conflict(admin_client):
+    response = admin_client.post('/orders/resources', json={'type': 'COLOR', 'name': 'RED', 'quantity': 1})
+
+    assert response.status_code == 409, response.get_json()
+    assert 'RED' in response.get_json()['message']
+    assert names() == ['RED', 'BLUE']
+    # the same name of the other type is a different resource
+    assert admin_client.post('/orders/resources', json={'type': 'MATERIAL', 'name': 'RED', 'quantity': 1}).status_code == 201
+
+
+def test_renaming_onto_a_taken_name_is_a_conflict(admin_client):
+    response = admin_client.put('/orders/resources/2', json={'type': 'COLOR', 'name': 'RED', 'quantity': 1})
+
+    assert response.status_code == 409, response.get_json()
+    assert names() == ['RED', 'BLUE']
+    assert admin_client.put('/orders/resources/2', json={'type': 'COLOR', 'name': 'NAVY', 'quantity': 1}).status_code == 200
@@ -0,0 +1,7 @@
+#entry point for pre-forking WSGI servers, e.g.
+#   gunicorn --preload --workers 4 wsgi:app
+#the config comes from APP_CONFIG, prod when it is unset, every worker drops the database connections it inherits
+from api import create_app
+from api.config.config import config_from_env
+
+app = create_app(config_from_env(default='prod'), commands=False)